@@ -0,0 +1,166 @@
+"""Peak memory of holding links in a list vs streaming compact LinkRecords.
+
+Generates synthetic LinkWarden link dicts (with page text) and runs them
+through the digest stage either the old way (every raw link kept in a list,
+then a filtered second list) or the streaming way (compact records whose
+text is dropped once digested). RSS is printed every 10% of links, so the
+list mode shows memory growing with the library while stream mode stays flat.
+
+Tag mode runs the whole tagging loop (tag_links) on the stream, with a stub
+in place of LinkWarden and Ollama and a real link journal, so near-duplicate
+matching and journaling are included; every 20th link mirrors an earlier one.
+
+    python3 bench_link_memory.py --mode list
+    python3 bench_link_memory.py --mode stream --links 100000
+    python3 bench_link_memory.py --mode tag --links 100000
+"""
+import argparse
+import logging
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from typing import Dict, Iterator, List
+
+from content_extract import DigestBuilder
+from link_journal import LinkJournal
+from link_record import LinkRecord
+from lw_tag_manager import tag_links
+
+WORDS = (
+    "python rust linux kernel database index query cache network proxy server client browser render "
+    "compiler parser memory thread async tokio numpy pandas model training inference embedding vector "
+    "search ranking privacy security encryption backup storage cloud docker kubernetes deploy release"
+).split()
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB (Linux /proc, else peak RSS)."""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * resource.getpagesize() / 2**20
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+def synthetic_links(count: int, text_kb: int) -> Iterator[Dict]:
+    """Yield link dicts shaped like LinkWarden API responses."""
+    words_per_text = text_kb * 1024 // 7
+    for link_id in range(1, count + 1):
+        rng = random.Random(link_id)
+        # Each page sticks to a few topic words, so unrelated pages get distinct SimHashes
+        source = random.Random(link_id - 10 if link_id % 20 == 0 else link_id)
+        topic = source.sample(WORDS, 6)
+        yield {
+            'id': link_id,
+            'name': f"Synthetic link {link_id}",
+            'type': 'url',
+            'url': f"https://example.com/articles/{link_id}",
+            'description': ' '.join(rng.choices(WORDS, k=20)),
+            'collectionId': 1,
+            'collection': {'id': 1, 'name': 'Unorganized', 'ownerId': 1, 'color': '#0ea5e9'},
+            'tags': [{'id': 1, 'name': rng.choice(WORDS)}],
+            'textContent': ' '.join(source.choices(topic, k=words_per_text)),
+            'createdAt': '2024-01-01T00:00:00.000Z',
+            'updatedAt': '2024-01-01T00:00:00.000Z',
+        }
+
+class _Pool:
+    """Stands in for OllamaPool: a fixed concurrency that never gives up."""
+    given_up = False
+    limit = 4
+    maximum = 4
+
+class StubManager:
+    """The parts of LinkWardenManager that tag_links uses, answering instantly."""
+
+    def __init__(self, digest_builder: DigestBuilder, near_duplicate_window: int):
+        self.digest_builder = digest_builder
+        self.near_duplicate_distance = 3
+        self.near_duplicate_window = near_duplicate_window
+        self.ollama = _Pool()
+        self.batch_size = 4
+        self.bulk_update_size = 50
+        self.bulk_updates = True
+        self.skip_tagged_links = False
+
+    def fetch_link_text(self, link_id: int) -> str:
+        return ''
+
+    def suggest_tags_batch(self, texts: Dict[int, str]) -> Dict[int, List[str]]:
+        return {link_id: sorted(set(text.split()[-3:])) for link_id, text in texts.items()}
+
+    def canonicalize_tags(self, tags: List[str]) -> List[str]:
+        return list(tags)
+
+    def bulk_add_tags(self, links: List[LinkRecord], tags: List[str]) -> bool:
+        return True
+
+    def update_link_tags(self, link_id: int, link_data: LinkRecord, new_tags: List[str]) -> bool:
+        return True
+
+def run_tagging(records: Iterator[LinkRecord], builder: DigestBuilder, step: int, window: int):
+    """Run tag_links over the records, printing RSS every step links."""
+    seen = 0
+
+    def counted() -> Iterator[LinkRecord]:
+        nonlocal seen
+        for record in records:
+            seen += 1
+            if seen % step == 0:
+                print(f"  {seen:>8} links tagged   RSS {current_rss_mb():8.1f} MB")
+            yield record
+
+    # Per-link progress logging would drown out the RSS lines
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as directory:
+        journal = LinkJournal(os.path.join(directory, 'journal.sqlite'))
+        outcomes = tag_links(StubManager(builder, window), counted(), journal=journal)
+        journal.close()
+    print(f"  outcomes: {dict(outcomes)}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', choices=['list', 'stream', 'tag'], default='stream')
+    parser.add_argument('--links', type=int, default=100000)
+    parser.add_argument('--text-kb', type=int, default=4, help="page text size per link")
+    parser.add_argument('--near-duplicate-window', type=int, default=20000,
+                        help="leaders kept for near-duplicate matching in tag mode (0 keeps all)")
+    args = parser.parse_args()
+
+    builder = DigestBuilder(workers=1)
+    step = max(1, args.links // 10)
+    start = time.perf_counter()
+    baseline = current_rss_mb()
+    print(f"mode={args.mode} links={args.links} text={args.text_kb}KB baseline RSS {baseline:.1f} MB")
+
+    if args.mode == 'list':
+        # What get_all_links() + main() used to do
+        all_links = []
+        for link in synthetic_links(args.links, args.text_kb):
+            all_links.append(link)
+            if len(all_links) % step == 0:
+                print(f"  {len(all_links):>8} links loaded   RSS {current_rss_mb():8.1f} MB")
+        owned = [link for link in all_links if link.get('collection', {}).get('ownerId') == 1]
+        records = (LinkRecord.from_api(link) for link in owned)
+    else:
+        records = (LinkRecord.from_api(link) for link in synthetic_links(args.links, args.text_kb))
+
+    if args.mode == 'tag':
+        run_tagging(records, builder, step, args.near_duplicate_window)
+    else:
+        done = 0
+        for _link, _digest in builder.digest_stream(records):
+            done += 1
+            if done % step == 0:
+                print(f"  {done:>8} links digested RSS {current_rss_mb():8.1f} MB")
+    builder.close()
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+    print(f"peak RSS {peak_mb:.1f} MB, {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""End-to-end throughput benchmark against local fake LinkWarden and Ollama servers.
+
+Starts the stand-in servers from fake_servers.py, then runs the documented
+workflow in a scratch directory: lw_tag_manager.py, export_tags.py, an edit
+of tags.txt that disallows some tags, and filter_tags.py. For each script
+it reports wall time, links/s and per-endpoint p50/p99 latencies as seen by
+the fake servers, so performance work can be validated without touching the
+real LinkWarden or GPU box. Settings from the environment / .env (workers,
+batch size, ...) apply as usual; only the server URLs and paths are
+overridden.
+
+    python3 bench_pipeline.py --links 2000 --ollama-latency 0.2 --ollama-jitter 0.05
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from typing import Dict, List, Optional
+
+from fake_servers import VOCABULARY, Behaviour, FakeLinkWarden, FakeOllama, synthetic_library
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def latency_report(*servers) -> Dict[str, Dict]:
+    report = {}
+    for server in servers:
+        for endpoint, samples in sorted(server.latencies.items()):
+            report[endpoint] = {
+                'requests': len(samples),
+                'p50_ms': round(percentile(samples, 0.50) * 1000, 1),
+                'p99_ms': round(percentile(samples, 0.99) * 1000, 1),
+            }
+    return report
+
+def run_script(name: str, workdir: str, env: Dict[str, str], stdin: Optional[str] = None) -> float:
+    """Run one of the scripts to completion; returns its wall time in seconds."""
+    log_path = os.path.join(workdir, f"{os.path.splitext(name)[0]}.log")
+    start = time.perf_counter()
+    with open(log_path, 'w') as log:
+        result = subprocess.run(
+            [sys.executable, os.path.join(HERE, name)], cwd=workdir, env=env, input=stdin,
+            stdout=log, stderr=subprocess.STDOUT, text=True
+        )
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        with open(log_path) as log:
+            tail = log.read()[-2000:]
+        raise SystemExit(f"{name} exited with status {result.returncode}:\n{tail}")
+    return elapsed
+
+def disallow_some_tags(tags_path: str, every: int) -> int:
+    """Comment out every n-th tag in tags.txt, as a curator would; returns how many."""
+    with open(tags_path) as f:
+        lines = f.readlines()
+    disallowed = 0
+    position = 0
+    for i, line in enumerate(lines):
+        if not line.strip() or line.startswith('#'):
+            continue
+        position += 1
+        if position % every == 0:
+            lines[i] = f"# {line}"
+            disallowed += 1
+    with open(tags_path, 'w') as f:
+        f.writelines(lines)
+    return disallowed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--links', type=int, default=500)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--collections', type=int, default=4)
+    parser.add_argument('--owners', type=int, default=1, help="users the collections are shared out to")
+    parser.add_argument('--linkwarden-latency', type=float, default=0.01, help="seconds per LinkWarden request")
+    parser.add_argument('--linkwarden-jitter', type=float, default=0.005)
+    parser.add_argument('--linkwarden-error-rate', type=float, default=0.0, help="fraction answered with 503")
+    parser.add_argument('--ollama-latency', type=float, default=0.2, help="seconds per Ollama request")
+    parser.add_argument('--ollama-jitter', type=float, default=0.05)
+    parser.add_argument('--ollama-error-rate', type=float, default=0.0)
+    parser.add_argument('--ollama-token-seconds', type=float, default=0.0, help="extra seconds per generated token")
+    parser.add_argument('--ollama-chatter', type=int, default=0, help="words of explanation after free-text answers")
+    parser.add_argument('--cascade-model', help="also tag with this small model first (OLLAMA_CASCADE_MODEL)")
+    parser.add_argument('--cascade-miss-rate', type=float, default=0.2,
+                        help="share of links the cascade model answers with tags outside tags.txt")
+    parser.add_argument('--disallow-every', type=int, default=3, help="disallow every n-th exported tag")
+    parser.add_argument('--workdir', help="keep databases and logs here instead of a temporary directory")
+    parser.add_argument('--report', help="also write the results as JSON to this file")
+    args = parser.parse_args()
+
+    linkwarden = FakeLinkWarden(
+        synthetic_library(args.links, owners=args.owners, collections=args.collections), page_size=args.page_size,
+        behaviour=Behaviour(args.linkwarden_latency, args.linkwarden_jitter, args.linkwarden_error_rate, seed=1)
+    ).start()
+    ollama = FakeOllama(
+        Behaviour(args.ollama_latency, args.ollama_jitter, args.ollama_error_rate, seed=2),
+        token_seconds=args.ollama_token_seconds, chatter_words=args.ollama_chatter,
+        weak_models={args.cascade_model: args.cascade_miss_rate} if args.cascade_model else None
+    ).start()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='lw-bench-')
+    os.makedirs(workdir, exist_ok=True)
+    env = {
+        **os.environ,
+        'LINKWARDEN_BASE_URL': linkwarden.base_url,
+        'LINKWARDEN_API_KEY': 'benchmark',
+        'OLLAMA_BASE_URL': ollama.url,
+        'SKIP_LINKS_WITH_TAGS': 'false',
+        'METRICS_PATH': os.path.join(workdir, 'run_metrics.json'),
+    }
+    if args.cascade_model:
+        # The cascade needs approved tags before the first run; export_tags.py replaces them later
+        env['OLLAMA_CASCADE_MODEL'] = args.cascade_model
+        with open(os.path.join(workdir, 'tags.txt'), 'w') as f:
+            f.write('\n'.join(VOCABULARY) + '\n')
+
+    results = {'links': args.links, 'workdir': workdir, 'scripts': {}}
+
+    def stage(name: str, stdin: Optional[str] = None):
+        linkwarden.reset_latencies()
+        ollama.reset_latencies()
+        elapsed = run_script(name, workdir, env, stdin)
+        results['scripts'][name] = {
+            'seconds': round(elapsed, 2),
+            'links_per_second': round(args.links / elapsed, 1),
+            'latency': latency_report(linkwarden, ollama),
+        }
+
+    try:
+        stage('lw_tag_manager.py')
+        stage('export_tags.py')
+        results['disallowed_tags'] = disallow_some_tags(os.path.join(workdir, 'tags.txt'), args.disallow_every)
+        stage('filter_tags.py', stdin='yes\n')
+    finally:
+        linkwarden.stop()
+        ollama.stop()
+
+    print(f"{args.links} links, scratch directory {workdir}")
+    for name, stats in results['scripts'].items():
+        print(f"\n{name}: {stats['seconds']:.2f}s, {stats['links_per_second']:.1f} links/s")
+        for endpoint, latency in stats['latency'].items():
+            print(f"  {endpoint:<22} {latency['requests']:>6} requests  "
+                  f"p50 {latency['p50_ms']:>8.1f} ms  p99 {latency['p99_ms']:>8.1f} ms")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
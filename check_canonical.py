@@ -0,0 +1,52 @@
+import random
+import string
+
+from tag_canonical import TagCanonicalizer, TrigramIndex, edit_distance
+
+print("Checking tag canonicalization...")
+
+# Near misses: candidates that pass the trigram filter but are too far away
+for vocabulary, suggestion in [
+    (['javascript'], 'typescript'),
+    (['self-hosting'], 'web hosting'),
+    (['python'], 'pythno'),
+]:
+    result = TagCanonicalizer(vocabulary).lookup(suggestion)
+    print(f"  {suggestion!r} against {vocabulary}: {result}")
+    assert result == (None, 'new'), result
+
+assert TagCanonicalizer(['python']).lookup('pythn') == ('python', 'fuzzy')
+assert TagCanonicalizer(['AI agent']).lookup('ai-agents') == ('AI agent', 'stem')
+
+# The trigram index must find exactly what a brute-force scan finds, hits and misses alike
+rng = random.Random(7)
+keys = sorted({''.join(rng.choices(string.ascii_lowercase[:8], k=rng.randint(3, 12))) for _ in range(500)})
+index = TrigramIndex()
+for key in keys:
+    index.add(key)
+
+checked = found = 0
+for _ in range(1000):
+    query = list(rng.choice(keys))
+    for _ in range(rng.randint(0, 4)):
+        position = rng.randrange(len(query) + 1)
+        operation = rng.choice('ids')
+        if operation == 'i':
+            query.insert(position, rng.choice(string.ascii_lowercase[:8]))
+        elif position < len(query):
+            if operation == 'd':
+                del query[position]
+            else:
+                query[position] = rng.choice(string.ascii_lowercase[:8])
+    query = ''.join(query)
+    max_distance = rng.randint(0, 3)
+
+    matches = [(edit_distance(query, key, max_distance), key) for key in keys]
+    expected = min(((distance, key) for distance, key in matches if distance <= max_distance), default=(None, None))[1]
+    actual = index.nearest(query, max_distance)
+    assert actual == expected, (query, max_distance, actual, expected)
+    checked += 1
+    found += actual is not None
+
+print(f"  trigram index agrees with brute force on {checked} lookups ({found} matches, {checked - found} misses)")
+print("OK")
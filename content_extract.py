@@ -0,0 +1,181 @@
+import os
+import re
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from link_record import LinkRecord
+from run_metrics import RunMetrics
+
+logger = logging.getLogger(__name__)
+
+# Rough size of a token for the models we use; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+# Lines matching these are site chrome, not content
+BOILERPLATE_RE = re.compile(
+    r'cookie|accept all|privacy policy|terms of (use|service)|all rights reserved|'
+    r'sign (in|up)|log ?in|subscribe|newsletter|skip to (main )?content|'
+    r'share (on|this)|follow us|advertisement|javascript (is )?(disabled|required)|'
+    r'enable javascript|copyright ©|©\s*\d{4}',
+    re.IGNORECASE
+)
+
+STOPWORDS = frozenset(
+    'a an and are as at be but by for from has have he her his i in is it its of on or our she '
+    'that the their them they this to was we were will with you your not no so if then than there '
+    'what which who when where how all can do does did just more most also about into over only'.split()
+)
+
+# Page text often arrives as one long line; long lines are re-split into chunks of sentences
+MAX_PARAGRAPH_CHARS = 400
+
+_WORD_RE = re.compile(r'\w+')
+_WHITESPACE_RE = re.compile(r'[ \t\r\f\v]+')
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s+')
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def _split_long(line: str) -> List[str]:
+    """Group the sentences of an overlong line into paragraph-sized chunks."""
+    if len(line) <= MAX_PARAGRAPH_CHARS:
+        return [line]
+
+    chunks = []
+    current = ''
+    for sentence in _SENTENCE_END_RE.split(line):
+        if current and len(current) + len(sentence) + 1 > MAX_PARAGRAPH_CHARS:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f'{current} {sentence}' if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+def _paragraphs(text: str) -> List[str]:
+    """Split text into whitespace-collapsed, non-boilerplate paragraphs."""
+    paragraphs = []
+    seen = set()
+    lines = (chunk for raw in text.splitlines() for chunk in _split_long(_WHITESPACE_RE.sub(' ', raw).strip()))
+    for line in lines:
+        if not line:
+            continue
+        words = line.split()
+        # Menus and button rows: a few words with no sentence punctuation
+        if len(words) < 6 and not re.search(r'[.!?:]', line):
+            continue
+        if len(words) < 40 and BOILERPLATE_RE.search(line):
+            continue
+        # Repeated blocks (sidebars, pull quotes) only need to be seen once
+        if line in seen:
+            continue
+        seen.add(line)
+        paragraphs.append(line)
+    return paragraphs
+
+def _informativeness(paragraph: str) -> float:
+    """Distinct content words per paragraph, damped for very long ones."""
+    words = [word for word in _WORD_RE.findall(paragraph.lower()) if word not in STOPWORDS and not word.isdigit()]
+    if not words:
+        return 0.0
+    distinct = len(set(words))
+    return distinct * (distinct / len(words))
+
+def build_digest(name: str, description: str, text_content: str, token_budget: int = 250) -> str:
+    """Build a compact, token-budgeted summary of a link for prompting.
+
+    Title and description come first; the remaining budget is filled with
+    the most informative paragraphs of the page text, kept in page order.
+    """
+    header = []
+    if name:
+        header.append(f"Title: {_WHITESPACE_RE.sub(' ', name).strip()}")
+    if description and description.strip() != (name or '').strip():
+        header.append(f"Description: {_WHITESPACE_RE.sub(' ', description).strip()}")
+    digest = "\n".join(header)
+
+    budget = token_budget - estimate_tokens(digest)
+    if not text_content or budget <= 0:
+        return digest[:token_budget * CHARS_PER_TOKEN]
+
+    paragraphs = _paragraphs(text_content)
+    ranked = sorted(range(len(paragraphs)), key=lambda i: _informativeness(paragraphs[i]), reverse=True)
+
+    chosen = []
+    for i in ranked:
+        cost = estimate_tokens(paragraphs[i]) + 1
+        if cost > budget:
+            # A long top paragraph still beats nothing; take what fits of it
+            if not chosen and budget > 16:
+                paragraphs[i] = paragraphs[i][:budget * CHARS_PER_TOKEN]
+                chosen.append(i)
+                budget = 0
+            continue
+        chosen.append(i)
+        budget -= cost
+        if budget <= 0:
+            break
+
+    body = "\n".join(paragraphs[i] for i in sorted(chosen))
+    return f"{digest}\n\n{body}".strip() if body else digest
+
+def _build_digest_args(args: Tuple[str, str, str, int]) -> str:
+    return build_digest(*args)
+
+class DigestBuilder:
+    """Build digests for a stream of links, using a process pool for big batches.
+
+    Digesting is pure CPU work on potentially large page texts, so chunks
+    of links are spread across cores. Small chunks are done in-process to
+    avoid pickling overhead.
+    """
+
+    def __init__(self, token_budget: int = 250, workers: Optional[int] = None, chunk_size: int = 32,
+                 pool_min_batch: int = 16, metrics: Optional[RunMetrics] = None):
+        self.token_budget = token_budget
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.pool_min_batch = pool_min_batch
+        self.metrics = metrics
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _digest_chunk(self, links: List[LinkRecord]) -> List[str]:
+        args = [(link.name, link.description, link.text, self.token_budget) for link in links]
+        # The digest is all that's needed from here on, so page text is only held for the chunk being digested
+        for link in links:
+            link.release_text()
+
+        if self.workers <= 1 or len(args) < self.pool_min_batch:
+            return [_build_digest_args(a) for a in args]
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        chunksize = max(1, len(args) // (self.workers * 4))
+        return list(self._pool.map(_build_digest_args, args, chunksize=chunksize))
+
+    def digest_stream(self, links: Iterable[LinkRecord]) -> Iterator[Tuple[LinkRecord, str]]:
+        """Yield (link, digest) pairs, digesting chunk_size links at a time.
+
+        Each link's page text is released once its digest has been built.
+        """
+        chunk = []
+        for link in links:
+            chunk.append(link)
+            if len(chunk) >= self.chunk_size:
+                yield from zip(chunk, self._timed_digest_chunk(chunk))
+                chunk = []
+        if chunk:
+            yield from zip(chunk, self._timed_digest_chunk(chunk))
+
+    def _timed_digest_chunk(self, links: List[LinkRecord]) -> List[str]:
+        if self.metrics is None:
+            return self._digest_chunk(links)
+        with self.metrics.timer('digest'):
+            return self._digest_chunk(links)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
@@ -1,9 +1,12 @@
 import os
-import requests
-from typing import Set
+from typing import Dict, Iterable, Optional
 import logging
 from dotenv import load_dotenv
 
+from link_snapshot import LinkSnapshot
+from lw_client import LinkWardenClient
+from tag_index import TagIndex
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -15,47 +18,51 @@ class TagExporter:
         load_dotenv()
         self.api_key = os.getenv('LINKWARDEN_API_KEY')
         self.base_url = os.getenv('LINKWARDEN_BASE_URL', 'http://localhost:3002/api/v1')
+        self.client = LinkWardenClient(self.base_url, self.api_key)
+        self.index = TagIndex(os.getenv('TAG_INDEX_PATH', 'tag_index.sqlite'))
+
+        # With LINK_SOURCE=snapshot links are read from a local copy kept current by delta syncs
+        self.snapshot = LinkSnapshot.from_env()
 
-        self.headers = {
-            'Authorization': f'Bearer {self.api_key}',
-            'Accept': 'application/json',
-            'Content-Type': 'application/json'
-        }
+    def iter_links(self):
+        """Yield every link's metadata, from the local snapshot or page by page from the API."""
+        if self.snapshot is not None:
+            self.snapshot.sync(self.client)
+            # Tag export never needs page text, so it isn't loaded
+            return self.snapshot.iter_links(include_text=False)
+        return self.client.iter_links()
 
     def get_all_links(self):
-        try:
-            response = requests.get(f'{self.base_url}/links', headers=self.headers)
-            response.raise_for_status()
-            data = response.json()
-            return data.get('response', [])
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error fetching links: {str(e)}")
-            return []
-
-    def extract_all_tags(self) -> Set[str]:
-        """Extract all unique tags from all links."""
-        links = self.get_all_links()
-        logger.info(f"Found {len(links)} links")
-
-        all_tags = set()
-        for link in links:
-            tags = link.get('tags', [])
-            for tag in tags:
-                tag_name = tag.get('name', '').strip()
-                if tag_name:
-                    all_tags.add(tag_name)
-
-        return all_tags
-
-    def save_tags_to_file(self, tags: Set[str], filename: str = 'tags.txt'):
-        """Save tags to a file, sorted alphabetically."""
+        return list(self.iter_links())
+
+    def extract_all_tags(self) -> Dict[str, int]:
+        """Return every tag with the number of links carrying it.
+
+        The local tag index is synced first; only links whose updatedAt
+        changed since the last export are re-indexed.
+        """
+        self.index.sync(
+            self.iter_links(),
+            is_complete=lambda: self.snapshot is not None or self.client.scan_complete
+        )
+        return self.index.tag_counts()
+
+    def save_tags_to_file(self, tags: Iterable[str], filename: str = 'tags.txt',
+                          counts: Optional[Dict[str, int]] = None):
+        """Save tags to a file, sorted alphabetically, with usage counts if given."""
         sorted_tags = sorted(tags)
 
         with open(filename, 'w') as f:
             f.write("# All tags extracted from LinkWarden\n")
-            f.write("# Edit this file to keep only the tags you want to allow\n\n")
+            f.write("# Edit this file to keep only the tags you want to allow\n")
+            if counts:
+                f.write("# The number after each tab is how many links use the tag (informational)\n")
+            f.write("\n")
             for tag in sorted_tags:
-                f.write(f"{tag}\n")
+                if counts:
+                    f.write(f"{tag}\t{counts.get(tag, 0)}\n")
+                else:
+                    f.write(f"{tag}\n")
 
         logger.info(f"Saved {len(sorted_tags)} unique tags to {filename}")
 
@@ -67,10 +74,15 @@ def main():
 
     if tags:
         logger.info(f"Found {len(tags)} unique tags")
-        exporter.save_tags_to_file(tags)
+        exporter.save_tags_to_file(tags, counts=tags)
         logger.info("Done! Review tags.txt and remove any unwanted tags.")
     else:
         logger.warning("No tags found in LinkWarden")
 
+    exporter.client.log_stats()
+    exporter.index.close()
+    if exporter.snapshot is not None:
+        exporter.snapshot.close()
+
 if __name__ == "__main__":
     main()
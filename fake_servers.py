@@ -0,0 +1,372 @@
+"""Local stand-ins for LinkWarden and Ollama, for benchmarks and offline runs.
+
+FakeLinkWarden serves a synthetic library over the parts of the v1 API the
+scripts use (cursor/skip pagination, single and bulk PUT). FakeOllama
+answers /api/generate and /api/embed with deterministic tags and vectors.
+Both add configurable latency, jitter and error rates, and record how
+long every request took.
+
+    python3 fake_servers.py --links 5000 --ollama-latency 0.2
+"""
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+VOCABULARY = (
+    "python rust golang linux kernel database postgres sqlite cache network proxy browser compiler parser "
+    "memory async numpy pandas training inference embedding search ranking privacy security encryption "
+    "backup storage cloud docker kubernetes deploy recipe baking pasta travel hiking camera photography "
+    "music guitar finance investing budget health running sleep history science physics astronomy"
+).split()
+
+class Behaviour:
+    """Latency, jitter and error rate injected into a fake server's responses."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self):
+        with self._lock:
+            seconds = self.latency + self._random.uniform(-self.jitter, self.jitter)
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+class FakeServer:
+    """Threaded HTTP server on localhost that records per-endpoint request latencies."""
+
+    def __init__(self, behaviour: Optional[Behaviour] = None, port: int = 0):
+        self.behaviour = behaviour or Behaviour()
+        self.latencies: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, endpoint: str, seconds: float):
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(seconds)
+
+    def reset_latencies(self):
+        with self._lock:
+            self.latencies = {}
+
+    def handle(self, method: str, path: str, query: Dict[str, List[str]], body: Optional[Dict]):
+        """Return (endpoint name, status, response object) for a request.
+
+        The response object may also be an iterator of objects, which is
+        streamed as newline-delimited JSON.
+        """
+        raise NotImplementedError
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out in separate writes; don't let Nagle delay the body
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _dispatch(self, method: str):
+                start = time.perf_counter()
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                parsed = urlparse(self.path)
+
+                server.behaviour.delay()
+                if server.behaviour.should_fail():
+                    endpoint, status, payload = 'error', 503, {'error': 'injected failure'}
+                else:
+                    endpoint, status, payload = server.handle(method, parsed.path, parse_qs(parsed.query), body)
+
+                if isinstance(payload, (dict, list)):
+                    data = json.dumps(payload).encode()
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                else:
+                    endpoint = self._stream(status, payload, endpoint)
+                server.record(f"{method} {endpoint}", time.perf_counter() - start)
+
+            def _stream(self, status: int, items, endpoint: str) -> str:
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                try:
+                    for item in items:
+                        line = json.dumps(item).encode() + b'\n'
+                        self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+                        self.wfile.flush()
+                    self.wfile.write(b'0\r\n\r\n')
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client stopped reading, as Ollama clients do to cancel generation
+                    self.close_connection = True
+                    return f"{endpoint} (cancelled)"
+                return endpoint
+
+            def do_GET(self):
+                self._dispatch('GET')
+
+            def do_PUT(self):
+                self._dispatch('PUT')
+
+            def do_POST(self):
+                self._dispatch('POST')
+
+        return Handler
+
+    def start(self) -> 'FakeServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+def synthetic_library(count: int, text_words: int = 400, owners: int = 1, collections: int = 4,
+                      seed: int = 0) -> List[Dict]:
+    """Build link dicts shaped like LinkWarden API responses, newest (highest ID) first.
+
+    Links are spread over `collections` collections, which are dealt out to
+    `owners` users; user 1 is the one the API key belongs to.
+    """
+    collections = max(collections, owners)
+    links = []
+    for link_id in range(count, 0, -1):
+        rng = random.Random(seed * 1_000_003 + link_id)
+        topic = rng.sample(VOCABULARY, 3)
+        words = rng.choices(VOCABULARY, k=text_words) + topic * (text_words // 20)
+        rng.shuffle(words)
+        collection_id = 1 + (link_id % collections)
+        owner_id = 1 + (collection_id - 1) % owners
+        links.append({
+            'id': link_id,
+            'name': f"{topic[0].title()} and {topic[1]} notes #{link_id}",
+            'type': 'url',
+            'url': f"https://example.com/{topic[0]}/{link_id}",
+            'description': f"About {' '.join(topic)}",
+            'collectionId': collection_id,
+            'collection': {'id': collection_id, 'name': f"Collection {collection_id}", 'ownerId': owner_id},
+            'tags': [{'id': 0, 'name': topic[0]}] if rng.random() < 0.3 else [],
+            'textContent': ' '.join(words),
+            'createdAt': '2024-01-01T00:00:00.000Z',
+            'updatedAt': '2024-01-01T00:00:00.000Z',
+        })
+    return links
+
+class FakeLinkWarden(FakeServer):
+    """In-memory LinkWarden v1 API: links, collections and the current user (ID 1)."""
+
+    def __init__(self, links: List[Dict], page_size: int = 50, behaviour: Optional[Behaviour] = None,
+                 port: int = 0):
+        super().__init__(behaviour, port)
+        self.links = links
+        self.by_id = {link['id']: link for link in links}
+        self.position = {link['id']: index for index, link in enumerate(links)}
+        self.page_size = page_size
+        self.writes = 0
+        self._data_lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.url}/api/v1"
+
+    def _touch(self, link: Dict, tags: List[Dict]):
+        link['tags'] = [{'id': 0, 'name': tag.get('name', '')} for tag in tags]
+        self.writes += 1
+        link['updatedAt'] = f"2024-06-01T00:00:00.{self.writes % 1000:03d}Z"
+
+    def handle(self, method, path, query, body):
+        if path in ('/api/v1/users/me', '/api/v1/profile'):
+            return 'user', 200, {'response': {'id': 1, 'username': 'benchmark', 'name': 'Benchmark'}}
+        if path == '/api/v1/collections':
+            collections = {link['collectionId']: link['collection'] for link in self.links}
+            return 'collections', 200, {'response': [collections[key] for key in sorted(collections)]}
+        if not path.startswith('/api/v1/links'):
+            return 'unknown', 404, {'response': 'Not found'}
+
+        match = re.fullmatch(r'/api/v1/links/(\d+)', path)
+        with self._data_lock:
+            if match:
+                link = self.by_id.get(int(match.group(1)))
+                if link is None:
+                    return 'links/{id}', 404, {'response': 'Link not found'}
+                if method == 'PUT':
+                    self._touch(link, body.get('tags', []))
+                return 'links/{id}', 200, {'response': link}
+
+            if method == 'PUT':
+                ids = {entry['id'] for entry in body.get('links', [])}
+                new_tags = body.get('newData', {}).get('tags', [])
+                updated = []
+                for link_id in ids:
+                    link = self.by_id.get(link_id)
+                    if link is None:
+                        continue
+                    existing = [] if body.get('removePreviousTags') else link['tags']
+                    names = [tag['name'] for tag in existing]
+                    self._touch(link, existing + [tag for tag in new_tags if tag['name'] not in names])
+                    updated.append(link)
+                # Like LinkWarden, answer with the updated links
+                return 'links (bulk)', 200, {'response': updated}
+
+            links = self.links
+            cursor = int(query['cursor'][0]) if query.get('cursor', [''])[0] else None
+            if 'collectionId' in query:
+                collection_id = int(query['collectionId'][0])
+                links = [link for link in links if link['collectionId'] == collection_id]
+                if cursor is not None:
+                    links = [link for link in links if link['id'] < cursor]
+            elif cursor is not None:
+                # Links are stored newest first, so the page starts right after the cursor link
+                links = links[self.position.get(cursor, -1) + 1:]
+            if 'skip' in query:
+                links = links[int(query['skip'][0]):]
+            take = int(query.get('take', [self.page_size])[0])
+            return 'links', 200, {'response': links[:take]}
+
+class FakeOllama(FakeServer):
+    """Ollama stand-in: /api/generate picks tags from the prompt's words, /api/embed hashes words.
+
+    Answers take token_seconds per generated token on top of the request
+    latency, and are streamed token by token when the request asks for it.
+    Free-text answers are followed by chatter_words of explanation, as
+    chatty models do. weak_models maps model names to the share of links
+    they answer with vague tags outside VOCABULARY, as small models do.
+    """
+
+    VAGUE_TAGS = ['article', 'website', 'interesting read']
+
+    def __init__(self, behaviour: Optional[Behaviour] = None, port: int = 0, token_seconds: float = 0.0,
+                 chatter_words: int = 0, weak_models: Optional[Dict[str, float]] = None):
+        super().__init__(behaviour, port)
+        self.token_seconds = token_seconds
+        self.chatter_words = chatter_words
+        self.weak_models = weak_models or {}
+
+    def _answer_for(self, model: str, text: str) -> List[str]:
+        miss_rate = self.weak_models.get(model, 0.0)
+        if miss_rate:
+            # Which links a weak model gets wrong depends only on the text, so runs are repeatable
+            digest = hashlib.blake2b(text.encode(), digest_size=4).digest()
+            if int.from_bytes(digest, 'big') / 2 ** 32 < miss_rate:
+                return self.VAGUE_TAGS
+        return self._tags_for(text)
+
+    @staticmethod
+    def _tags_for(text: str) -> List[str]:
+        words = re.findall(r'[a-z]+', text.lower())
+        counts: Dict[str, int] = {}
+        for word in words:
+            if word in VOCABULARY:
+                counts[word] = counts.get(word, 0) + 1
+        return sorted(counts, key=lambda word: (-counts[word], word))[:3]
+
+    @staticmethod
+    def _vector(text: str, dimensions: int = 64) -> List[float]:
+        vector = [0.0] * dimensions
+        for word in re.findall(r'[a-z]+', text.lower()):
+            digest = hashlib.blake2b(word.encode(), digest_size=2).digest()
+            vector[int.from_bytes(digest, 'big') % dimensions] += 1.0
+        return vector
+
+    def _stats(self, prompt: str, tokens: List[str]) -> Dict:
+        seconds = max(self.behaviour.latency, 0.001)
+        return {
+            'done': True,
+            'prompt_eval_count': len(prompt) // 4,
+            'prompt_eval_duration': int(seconds * 0.3e9),
+            'eval_count': max(1, len(tokens)),
+            'eval_duration': int(max(seconds * 0.7, self.token_seconds * len(tokens)) * 1e9),
+        }
+
+    def _stream_answer(self, model: str, prompt: str, tokens: List[str]):
+        for token in tokens:
+            time.sleep(self.token_seconds)
+            yield {'model': model, 'response': token, 'done': False}
+        yield {'model': model, 'response': '', **self._stats(prompt, tokens)}
+
+    def handle(self, method, path, query, body):
+        if path == '/api/embed':
+            inputs = body.get('input', [])
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            return 'api/embed', 200, {'model': body.get('model'), 'embeddings': [self._vector(text) for text in inputs]}
+
+        if path != '/api/generate':
+            return 'unknown', 404, {'error': 'not found'}
+
+        prompt = body.get('prompt', '')
+        model = body.get('model')
+        sections = re.split(r'### Link ID (\d+)\n', prompt)
+        if body.get('format') and len(sections) > 1:
+            # Batch prompt: answer with a JSON object keyed by link ID
+            answer = json.dumps({
+                link_id: self._answer_for(model, text) for link_id, text in zip(sections[1::2], sections[2::2])
+            })
+        elif isinstance(body.get('format'), dict):
+            answer = json.dumps({'tags': self._answer_for(model, prompt)})
+        else:
+            answer = ', '.join(self._answer_for(model, prompt))
+            if self.chatter_words:
+                answer += "\n\nThese tags were chosen because " + ' '.join(['the text'] * (self.chatter_words // 2))
+
+        tokens = re.findall(r'\s*\S{1,4}', answer)
+        if body.get('stream'):
+            return 'api/generate (stream)', 200, self._stream_answer(body.get('model'), prompt, tokens)
+        time.sleep(self.token_seconds * len(tokens))
+        return 'api/generate', 200, {'model': body.get('model'), 'response': answer, **self._stats(prompt, tokens)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fake LinkWarden and Ollama APIs on localhost")
+    parser.add_argument('--links', type=int, default=1000)
+    parser.add_argument('--linkwarden-port', type=int, default=3002)
+    parser.add_argument('--ollama-port', type=int, default=11434)
+    parser.add_argument('--linkwarden-latency', type=float, default=0.01)
+    parser.add_argument('--ollama-latency', type=float, default=0.2)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    linkwarden = FakeLinkWarden(
+        synthetic_library(args.links), behaviour=Behaviour(args.linkwarden_latency, args.jitter, args.error_rate),
+        port=args.linkwarden_port
+    ).start()
+    ollama = FakeOllama(Behaviour(args.ollama_latency, args.jitter, args.error_rate), port=args.ollama_port).start()
+
+    print(f"LINKWARDEN_BASE_URL={linkwarden.base_url}")
+    print(f"OLLAMA_BASE_URL={ollama.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        linkwarden.stop()
+        ollama.stop()
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,17 @@
 import os
-import json
+import time
+import argparse
+import threading
 import requests
-from typing import List, Dict, Set
+from typing import List, Dict, Iterator, Optional, Set
 import logging
 from dotenv import load_dotenv
 
+from link_snapshot import LinkSnapshot
+from lw_client import LinkWardenClient
+from rate_limit import RateLimitedWriter
+from tag_index import TagIndex
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -12,37 +19,67 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class TagFilter:
-    def __init__(self):
+    def __init__(self, max_rps: Optional[float] = None, max_in_flight: Optional[int] = None):
         load_dotenv()
         self.api_key = os.getenv('LINKWARDEN_API_KEY')
         self.base_url = os.getenv('LINKWARDEN_BASE_URL', 'http://localhost:3002/api/v1')
 
-        self.headers = {
-            'Authorization': f'Bearer {self.api_key}',
-            'Accept': 'application/json',
-            'Content-Type': 'application/json'
-        }
+        # Write throughput limits, so a big cleanup doesn't overwhelm the server
+        self.max_rps = max_rps if max_rps is not None else float(os.getenv('FILTER_MAX_RPS', '10'))
+        self.max_in_flight = max(1, max_in_flight or int(os.getenv('FILTER_MAX_IN_FLIGHT', '4')))
+
+        # One pooled connection per concurrent write, plus one for page prefetching
+        self.client = LinkWardenClient(self.base_url, self.api_key, pool_size=self.max_in_flight + 1)
+
+        # With LINK_SOURCE=snapshot links are read from a local copy kept current by delta syncs
+        self.snapshot = LinkSnapshot.from_env()
+
+        # Tag -> links index maintained by export_tags.py, lw_tag_manager.py's writes and full scans here;
+        # edits made in the UI to older links are only seen by a full scan, forced once the last is this old
+        self.index = TagIndex(os.getenv('TAG_INDEX_PATH', 'tag_index.sqlite'))
+        self.index_full_sync_hours = float(os.getenv('TAG_INDEX_FULL_SYNC_HOURS', '24'))
 
     def load_allowed_tags(self, tags_file: str = 'tags.txt') -> Set[str]:
         """Load allowed tags from file."""
         try:
             with open(tags_file, 'r') as f:
-                tags = {line.strip() for line in f if line.strip() and not line.startswith('#')}
+                # Anything after a tab is an informational usage count written by export_tags.py
+                tags = {line.split('\t', 1)[0].strip() for line in f if line.strip() and not line.startswith('#')}
                 logger.info(f"Loaded {len(tags)} allowed tags from {tags_file}")
                 return tags
         except FileNotFoundError:
             logger.error(f"Tags file {tags_file} not found")
             return set()
 
-    def get_all_links(self) -> List[Dict]:
+    def iter_links(self) -> Iterator[Dict]:
+        """Yield every link, from the local snapshot or page by page from the API."""
+        if self.snapshot is not None:
+            self.snapshot.sync(self.client)
+            return self.snapshot.iter_links()
+        return self.client.iter_links()
+
+    def sync_index(self):
+        """Bring the tag index up to date with links added or changed since it was last synced."""
+        links = self.iter_links() if self.snapshot is not None else self.client.iter_links(sort=0)
         try:
-            response = requests.get(f'{self.base_url}/links', headers=self.headers)
-            response.raise_for_status()
-            data = response.json()
-            return data.get('response', [])
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error fetching links: {str(e)}")
-            return []
+            # Both sources list newest links first
+            self.index.delta_sync(links)
+        finally:
+            links.close()
+
+    def _scan_complete(self) -> bool:
+        return self.snapshot is not None or self.client.scan_complete
+
+    def get_all_links(self) -> List[Dict]:
+        return list(self.iter_links())
+
+    def get_link(self, link_id: int) -> Optional[Dict]:
+        """The link, or None if it no longer exists; any other error is raised."""
+        response = self.client.get(f'/links/{link_id}')
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json().get('response')
 
     def update_link_tags(self, link_id: int, link_data: Dict, filtered_tags: List[str]) -> bool:
         try:
@@ -55,51 +92,167 @@ class TagFilter:
                 "collection": link_data.get('collection', {"id": 0})
             }
 
-            response = requests.put(
-                f'{self.base_url}/links/{link_id}',
-                headers=self.headers,
-                json=update_data
-            )
+            response = self.client.put(f'/links/{link_id}', json=update_data)
             response.raise_for_status()
+
+            # The server's new updatedAt is unknown here, so the next sync re-reads this link
+            self.index.update_link({'id': link_id, 'updatedAt': None, 'tags': update_data['tags']})
+            if self.snapshot is not None:
+                self.snapshot.update_link({**link_data, 'tags': update_data['tags']})
             return True
         except requests.exceptions.RequestException as e:
             logger.error(f"Error updating link {link_id}: {e}")
             return False
 
-    def filter_link_tags(self, allowed_tags: Set[str]):
-        """Remove tags from links that aren't in the allowed list."""
-        links = self.get_all_links()
-        logger.info(f"Found {len(links)} links to process")
+    def _refresh_and_filter(self, link_id: int, allowed_tags: Set[str]) -> Optional[bool]:
+        """Re-read an indexed link and write its filtered tags.
 
-        modified_count = 0
-        removed_tags_count = 0
+        Returns None if the link no longer carries disallowed tags (or was
+        deleted, which also drops it from the index), otherwise whether it
+        was read and updated successfully.
+        """
+        try:
+            link = self.get_link(link_id)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error fetching link {link_id}: {e}")
+            return False
+        if link is None:
+            logger.info(f"Link {link_id} was deleted - dropping it from the tag index")
+            self.index.remove_link(link_id)
+            return None
+
+        existing_tags = [tag.get('name', '') for tag in link.get('tags', [])]
+        filtered_tags = [tag for tag in existing_tags if tag in allowed_tags]
+        if len(filtered_tags) == len(existing_tags):
+            # The index was stale for this link; bring it up to date
+            self.index.update_link(link)
+            return None
 
-        for link in links:
-            link_id = link.get('id')
-            name = link.get('name', '')
-            existing_tags = [tag.get('name', '') for tag in link.get('tags', [])]
+        logger.info(f"Link '{link.get('name', '')}': Removing tags {set(existing_tags) - set(filtered_tags)}")
+        return self.update_link_tags(link_id, link, filtered_tags)
 
-            # Filter tags to only include allowed ones
-            filtered_tags = [tag for tag in existing_tags if tag in allowed_tags]
+    def filter_link_tags(self, allowed_tags: Set[str], dry_run: bool = False, full_scan: bool = False):
+        """Remove tags from links that aren't in the allowed list.
 
-            # Check if any tags were removed
-            if len(filtered_tags) < len(existing_tags):
-                removed = set(existing_tags) - set(filtered_tags)
-                removed_tags_count += len(removed)
+        If the tag index has been fully synced (by export_tags.py or an
+        earlier full scan) within index_full_sync_hours, it is delta synced
+        and only the links it lists under a disallowed tag are re-read and
+        updated. Otherwise every page of links is streamed, which also
+        rebuilds the index. Updates are written concurrently (at most
+        max_in_flight at once, max_rps per second). With dry_run the planned
+        changes are printed and nothing is written.
+        """
+        last_full_sync = self.index.last_full_sync()
+        if not full_scan and last_full_sync is not None:
+            if time.time() - last_full_sync > self.index_full_sync_hours * 3600:
+                logger.info("Last full tag index sync is too old - checking every link")
+                full_scan = True
+        if full_scan or last_full_sync is None:
+            self._filter_all_links(allowed_tags, dry_run)
+        else:
+            self.sync_index()
+            self._filter_indexed_links(allowed_tags, dry_run)
 
-                logger.info(f"Link '{name}': Removing tags {removed}")
+    def _filter_indexed_links(self, allowed_tags: Set[str], dry_run: bool):
+        disallowed = set(self.index.tag_counts()) - allowed_tags
+        candidates = sorted(self.index.links_with_any_tag(disallowed))
+        logger.info(f"Tag index lists {len(disallowed)} disallowed tags on {len(candidates)} links")
 
-                success = self.update_link_tags(link_id, link, filtered_tags)
-                if success:
+        if dry_run:
+            for link_id in candidates:
+                tags = self.index.tags_for_link(link_id)
+                removed = sorted(tag for tag in tags if tag not in allowed_tags)
+                print(f"[dry-run] Link {link_id}: remove {removed} -> keep {[tag for tag in tags if tag in allowed_tags]}")
+            logger.info(f"Dry run complete: {len(candidates)} links would be updated (from the tag index)")
+            return
+
+        outcomes = {'modified': 0, 'failed': 0, 'already_clean': 0}
+        lock = threading.Lock()
+
+        def on_done(future, link_id: int):
+            result = future.result()
+            with lock:
+                if result is None:
+                    outcomes['already_clean'] += 1
+                elif result:
+                    outcomes['modified'] += 1
+                else:
+                    outcomes['failed'] += 1
+                    logger.error(f"Failed to update link {link_id}")
+
+        with RateLimitedWriter(self.max_rps, self.max_in_flight) as writer:
+            for link_id in candidates:
+                future = writer.submit(self._refresh_and_filter, link_id, allowed_tags)
+                future.add_done_callback(lambda f, link_id=link_id: on_done(f, link_id))
+
+        logger.info(f"Filter complete: {len(candidates)} indexed links checked, modified {outcomes['modified']} "
+                    f"({outcomes['failed']} failed, {outcomes['already_clean']} already clean or deleted)")
+
+    def _filter_all_links(self, allowed_tags: Set[str], dry_run: bool):
+        processed_count = 0
+        modified_count = 0
+        failed_count = 0
+        removed_tags_count = 0
+        lock = threading.Lock()
+
+        def on_written(future, name: str, existing_tags: List[str], filtered_tags: List[str]):
+            nonlocal modified_count, failed_count
+            with lock:
+                if future.result():
                     modified_count += 1
                     logger.info(f"Updated '{name}': {existing_tags} -> {filtered_tags}")
                 else:
+                    failed_count += 1
                     logger.error(f"Failed to update '{name}'")
 
-        logger.info(f"Filter complete: Modified {modified_count} links, removed {removed_tags_count} tags")
+        links = self.index.indexing(self.iter_links(), is_complete=self._scan_complete)
+
+        with RateLimitedWriter(self.max_rps, self.max_in_flight) as writer:
+            for link in links:
+                processed_count += 1
+                link_id = link.get('id')
+                name = link.get('name', '')
+                existing_tags = [tag.get('name', '') for tag in link.get('tags', [])]
+
+                # Filter tags to only include allowed ones
+                filtered_tags = [tag for tag in existing_tags if tag in allowed_tags]
+
+                # Check if any tags were removed
+                if len(filtered_tags) < len(existing_tags):
+                    removed = set(existing_tags) - set(filtered_tags)
+                    removed_tags_count += len(removed)
+
+                    if dry_run:
+                        print(f"[dry-run] Link {link_id} '{name}': remove {sorted(removed)} -> keep {filtered_tags}")
+                        continue
+
+                    logger.info(f"Link '{name}': Removing tags {removed}")
+
+                    future = writer.submit(self.update_link_tags, link_id, link, filtered_tags)
+                    future.add_done_callback(
+                        lambda f, name=name, existing=existing_tags, filtered=filtered_tags:
+                            on_written(f, name, existing, filtered)
+                    )
+
+        if dry_run:
+            logger.info(f"Dry run complete: {processed_count} links checked, "
+                        f"would remove {removed_tags_count} tags")
+        else:
+            logger.info(f"Filter complete: {processed_count} links checked, modified {modified_count} links "
+                        f"({failed_count} failed), removed {removed_tags_count} tags")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Remove tags not listed in tags.txt from all links")
+    parser.add_argument('--dry-run', action='store_true', help="print the planned changes without writing them")
+    parser.add_argument('--full-scan', action='store_true',
+                        help="check every link instead of only those the tag index lists with disallowed tags")
+    parser.add_argument('--max-rps', type=float, help="maximum update requests per second (FILTER_MAX_RPS)")
+    parser.add_argument('--max-in-flight', type=int, help="maximum concurrent update requests (FILTER_MAX_IN_FLIGHT)")
+    return parser.parse_args()
 
 def main():
-    filter = TagFilter()
+    args = parse_args()
+    filter = TagFilter(max_rps=args.max_rps, max_in_flight=args.max_in_flight)
 
     # Load allowed tags
     allowed_tags = filter.load_allowed_tags('tags.txt')
@@ -110,13 +263,19 @@ def main():
 
     logger.info(f"Filtering tags to allowed list: {sorted(allowed_tags)}")
 
+    if args.dry_run:
+        filter.filter_link_tags(allowed_tags, dry_run=True, full_scan=args.full_scan)
+        filter.client.log_stats()
+        return
+
     # Confirm before proceeding
     print(f"\nThis will remove all tags NOT in tags.txt from all links.")
     print(f"Allowed tags ({len(allowed_tags)}): {', '.join(sorted(allowed_tags))}")
     response = input("\nProceed? (yes/no): ")
 
     if response.lower() in ['yes', 'y']:
-        filter.filter_link_tags(allowed_tags)
+        filter.filter_link_tags(allowed_tags, full_scan=args.full_scan)
+        filter.client.log_stats()
     else:
         logger.info("Cancelled by user")
 
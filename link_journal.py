@@ -0,0 +1,81 @@
+import logging
+import sqlite3
+import time
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Outcomes after which a link needs no further work until it changes
+DONE_OUTCOMES = {'updated', 'no_change'}
+
+# Outcomes of links that failed (a LinkWarden write or Ollama) and should be tried again
+RETRY_OUTCOMES = ('failed', 'inference_failed')
+
+class LinkJournal:
+    """Durable record of which links were processed, and in what state.
+
+    Each entry stores the link's updatedAt as LinkWarden reported it after
+    processing, so a later run can tell whether the link changed since, and
+    how many times in a row the link has failed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS processed_links ("
+            " link_id INTEGER PRIMARY KEY,"
+            " updated_at TEXT,"
+            " outcome TEXT NOT NULL,"
+            " processed_at REAL NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(processed_links)")}
+        if 'attempts' not in columns:
+            # Journals written before failed attempts were counted
+            self._conn.execute("ALTER TABLE processed_links ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+        self._conn.commit()
+
+        logger.info(f"Opened link journal {path} with {len(self)} entries")
+
+    def _entry(self, link_id: int) -> Optional[Tuple[Optional[str], str, int]]:
+        # Read by primary key instead of kept in memory, which would grow with the library
+        return self._conn.execute(
+            "SELECT updated_at, outcome, attempts FROM processed_links WHERE link_id = ?", (link_id,)
+        ).fetchone()
+
+    def is_current(self, link_id: int, updated_at: Optional[str]) -> bool:
+        """True if the link was successfully processed and hasn't changed since."""
+        entry = self._entry(link_id)
+        if entry is None or updated_at is None:
+            return False
+        journaled_at, outcome, _ = entry
+        return outcome in DONE_OUTCOMES and journaled_at == updated_at
+
+    def outcome(self, link_id: int) -> Optional[str]:
+        entry = self._entry(link_id)
+        return entry[1] if entry is not None else None
+
+    def failed_attempts(self, link_id: int) -> int:
+        """How many times in a row the link ended in a retry outcome."""
+        entry = self._entry(link_id)
+        return entry[2] if entry is not None else 0
+
+    def high_water_mark(self) -> Optional[int]:
+        """Highest link ID ever processed, or None for an empty journal."""
+        return self._conn.execute("SELECT MAX(link_id) FROM processed_links").fetchone()[0]
+
+    def record(self, link_id: int, updated_at: Optional[str], outcome: str):
+        attempts = self.failed_attempts(link_id) + 1 if outcome in RETRY_OUTCOMES else 0
+        self._conn.execute(
+            "INSERT OR REPLACE INTO processed_links (link_id, updated_at, outcome, processed_at, attempts)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (link_id, updated_at, outcome, time.time(), attempts)
+        )
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM processed_links").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
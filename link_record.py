@@ -0,0 +1,74 @@
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+class LinkRecord:
+    """Compact view of a LinkWarden link holding only what tagging needs.
+
+    API link dicts carry every field LinkWarden returns, including the full
+    page text. A record keeps the id, name, url, description, tag names,
+    collection/owner and updatedAt in slots, and the page text only until
+    release_text() is called. The text can also be loaded lazily through
+    load_text (e.g. from the local snapshot), so it is only in memory while
+    the link's digest is being built.
+    """
+
+    __slots__ = ('id', 'name', 'url', 'description', 'tags', 'collection_id', 'owner_id', 'updated_at',
+                 '_text', '_load_text')
+
+    def __init__(self, id: int, name: str = '', url: str = '', description: str = '',
+                 tags: Iterable[str] = (), collection_id: int = 0, owner_id: Optional[int] = None,
+                 updated_at: Optional[str] = None, text: Optional[str] = None,
+                 load_text: Optional[Callable[[int], str]] = None):
+        self.id = id
+        self.name = name
+        self.url = url
+        self.description = description
+        self.tags: Tuple[str, ...] = tuple(tags)
+        self.collection_id = collection_id
+        self.owner_id = owner_id
+        self.updated_at = updated_at
+        self._text = text
+        self._load_text = load_text
+
+    @classmethod
+    def from_api(cls, link: Dict, load_text: Optional[Callable[[int], str]] = None) -> 'LinkRecord':
+        """Build a record from a link dict as returned by the LinkWarden API."""
+        collection = link.get('collection') or {}
+        tags = []
+        for tag in link.get('tags', []):
+            name = tag.get('name', '')
+            if name and name not in tags:
+                tags.append(name)
+
+        return cls(
+            link['id'],
+            name=link.get('name') or '',
+            url=link.get('url') or '',
+            description=link.get('description') or '',
+            tags=tags,
+            collection_id=collection.get('id', link.get('collectionId', 0)),
+            owner_id=collection.get('ownerId'),
+            updated_at=link.get('updatedAt'),
+            text=link.get('textContent') if load_text is None else None,
+            load_text=load_text
+        )
+
+    @property
+    def text(self) -> str:
+        """The link's page text, loaded on first access if it wasn't given up front."""
+        if self._text is None and self._load_text is not None:
+            self._text = self._load_text(self.id) or ''
+        return self._text or ''
+
+    def defer_text(self, load_text: Callable[[int], str]):
+        """Drop page text held now; it is loaded again through load_text when next needed."""
+        if self._load_text is None:
+            self._text = None
+            self._load_text = load_text
+
+    def release_text(self):
+        """Drop the page text once it's no longer needed (after digesting)."""
+        self._text = None
+        self._load_text = None
+
+    def __repr__(self) -> str:
+        return f"LinkRecord(id={self.id!r}, name={self.name!r})"
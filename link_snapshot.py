@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import logging
+import sqlite3
+import threading
+from typing import Dict, Iterator, List, Optional, Set
+
+from lw_client import LinkWardenClient
+
+logger = logging.getLogger(__name__)
+
+# Fields kept out of the metadata rows; page text is stored (and read) separately
+TEXT_FIELDS = ('textContent',)
+
+# A delta sync stops after this many consecutive links that are already up to date
+DELTA_STOP_AFTER_KNOWN = 50
+
+class LinkSnapshot:
+    """Local copy of the LinkWarden library kept current by delta syncs.
+
+    Link metadata and page text live in separate tables, so readers that
+    only need tags (like export_tags.py) never load text bodies.
+
+    LinkWarden can't list links by modification time, so a delta sync walks
+    links newest first and stops once it has seen a run of links that are
+    already stored unchanged. Edits made elsewhere to older links are picked
+    up by a full sync, which runs when forced or when the last one is older
+    than full_sync_hours.
+    """
+
+    def __init__(self, path: str = 'link_snapshot.sqlite', full_sync_hours: float = 24):
+        self.path = path
+        self.full_sync_hours = full_sync_hours
+        # Writers in filter_tags.py update the snapshot from worker threads
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS links ("
+            " id INTEGER PRIMARY KEY,"
+            " updated_at TEXT,"
+            " data TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS link_texts ("
+            " id INTEGER PRIMARY KEY,"
+            " text_content TEXT);"
+            "CREATE TABLE IF NOT EXISTS meta ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT);"
+        )
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls) -> Optional['LinkSnapshot']:
+        """Open the snapshot if LINK_SOURCE=snapshot, otherwise return None."""
+        if os.getenv('LINK_SOURCE', 'api').lower() != 'snapshot':
+            return None
+        return cls(
+            os.getenv('LINK_SNAPSHOT_PATH', 'link_snapshot.sqlite'),
+            float(os.getenv('SNAPSHOT_FULL_SYNC_HOURS', '24'))
+        )
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _store(self, link: Dict, with_text: bool = True):
+        metadata = {key: value for key, value in link.items() if key not in TEXT_FIELDS}
+        self._conn.execute(
+            "INSERT OR REPLACE INTO links (id, updated_at, data) VALUES (?, ?, ?)",
+            (link['id'], link.get('updatedAt'), json.dumps(metadata))
+        )
+        if with_text:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO link_texts (id, text_content) VALUES (?, ?)",
+                (link['id'], link.get('textContent') or '')
+            )
+
+    def update_link(self, link: Dict):
+        """Record a change we made ourselves (new tags, new updatedAt); text is left as is."""
+        with self._lock:
+            self._store(link, with_text=False)
+            self._conn.commit()
+
+    def update_tags(self, link_id: int, tags: List[str], updated_at: Optional[str] = None):
+        """Record new tags written to a stored link (and its new updatedAt, if known)."""
+        with self._lock:
+            row = self._conn.execute("SELECT updated_at, data FROM links WHERE id = ?", (link_id,)).fetchone()
+            if row is None:
+                return
+            link = json.loads(row[1])
+            link['tags'] = [{"name": tag} for tag in tags]
+            if updated_at:
+                link['updatedAt'] = updated_at
+            self._conn.execute(
+                "UPDATE links SET updated_at = ?, data = ? WHERE id = ?",
+                (updated_at or row[0], json.dumps(link), link_id)
+            )
+            self._conn.commit()
+
+    def sync(self, client: LinkWardenClient, full: bool = False) -> Dict[str, int]:
+        """Pull new and changed links from LinkWarden into the snapshot."""
+        with self._lock:
+            last_full = float(self._meta('last_full_sync') or 0)
+            stored = dict(self._conn.execute("SELECT id, updated_at FROM links"))
+
+        if not full and time.time() - last_full > self.full_sync_hours * 3600:
+            logger.info("Last full snapshot sync is too old - doing a full sync")
+            full = True
+
+        stats = {'seen': 0, 'new': 0, 'changed': 0, 'removed': 0}
+        seen: Set[int] = set()
+        known_run = 0
+
+        # Newest first, so a delta sync can stop once it reaches links it already has
+        links = client.iter_links(sort=0)
+        try:
+            for link in links:
+                stats['seen'] += 1
+                seen.add(link['id'])
+
+                if link['id'] not in stored:
+                    stats['new'] += 1
+                elif stored[link['id']] != link.get('updatedAt'):
+                    stats['changed'] += 1
+                else:
+                    known_run += 1
+                    if not full and known_run >= DELTA_STOP_AFTER_KNOWN:
+                        break
+                    continue
+
+                known_run = 0
+                with self._lock:
+                    self._store(link)
+                    if (stats['new'] + stats['changed']) % 500 == 0:
+                        self._conn.commit()
+        finally:
+            links.close()
+
+        with self._lock:
+            if full and client.scan_complete:
+                stale = [link_id for link_id in stored if link_id not in seen]
+                self._conn.executemany("DELETE FROM links WHERE id = ?", [(link_id,) for link_id in stale])
+                self._conn.executemany("DELETE FROM link_texts WHERE id = ?", [(link_id,) for link_id in stale])
+                stats['removed'] = len(stale)
+                self._set_meta('last_full_sync', str(time.time()))
+            self._set_meta('last_sync', str(time.time()))
+            self._conn.commit()
+
+        logger.info(
+            f"Snapshot {'full' if full else 'delta'} sync: {stats['seen']} links read, {stats['new']} new, "
+            f"{stats['changed']} changed, {stats['removed']} removed"
+        )
+        return stats
+
+    def iter_links(self, include_text: bool = False, batch_size: int = 500) -> Iterator[Dict]:
+        """Yield stored links newest first, optionally with their textContent.
+
+        Rows are read in keyset-paginated batches, so callers may update the
+        snapshot while iterating and memory stays bounded.
+        """
+        if include_text:
+            query = ("SELECT links.id, links.data, link_texts.text_content FROM links"
+                     " LEFT JOIN link_texts ON link_texts.id = links.id"
+                     " WHERE links.id < ? ORDER BY links.id DESC LIMIT ?")
+        else:
+            query = "SELECT id, data, NULL FROM links WHERE id < ? ORDER BY id DESC LIMIT ?"
+
+        last_id = float('inf')
+        while True:
+            with self._lock:
+                rows = self._conn.execute(query, (last_id, batch_size)).fetchall()
+            if not rows:
+                return
+            for link_id, data, text_content in rows:
+                link = json.loads(data)
+                if include_text:
+                    link['textContent'] = text_content or ''
+                yield link
+            last_id = rows[-1][0]
+
+    def get_text(self, link_id: int) -> str:
+        with self._lock:
+            row = self._conn.execute("SELECT text_content FROM link_texts WHERE id = ?", (link_id,)).fetchone()
+        return row[0] or '' if row else ''
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM links").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,307 @@
+import time
+import heapq
+import queue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# Statuses our reverse proxy returns while LinkWarden restarts or is overloaded
+RETRY_STATUSES = (502, 503, 504)
+
+# Only calls that are safe to repeat are retried
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+# Endpoints that describe the user an API key belongs to, tried in order
+CURRENT_USER_ENDPOINTS = ('/users/me', '/profile')
+
+class ClientStats:
+    """Thread-safe totals of where LinkWarden request time goes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.connect_seconds = 0.0
+        self.request_seconds = 0.0
+
+    def add_connection(self, seconds: float):
+        with self._lock:
+            self.connections += 1
+            self.connect_seconds += seconds
+
+    def add_request(self, seconds: float):
+        with self._lock:
+            self.requests += 1
+            self.request_seconds += seconds
+
+    @property
+    def transfer_seconds(self) -> float:
+        """Request time not spent opening connections (waiting + transferring)."""
+        return max(0.0, self.request_seconds - self.connect_seconds)
+
+    def as_dict(self) -> Dict:
+        return {
+            'requests': self.requests,
+            'connections': self.connections,
+            'connect_seconds': round(self.connect_seconds, 3),
+            'transfer_seconds': round(self.transfer_seconds, 3),
+        }
+
+class _TimedAdapter(HTTPAdapter):
+    """HTTPAdapter whose connections report how long they took to open."""
+
+    def __init__(self, stats: ClientStats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        stats = self.stats
+
+        class TimedHTTPConnection(HTTPConnection):
+            def connect(self):
+                start = time.perf_counter()
+                super().connect()
+                stats.add_connection(time.perf_counter() - start)
+
+        class TimedHTTPSConnection(HTTPSConnection):
+            def connect(self):
+                start = time.perf_counter()
+                super().connect()
+                stats.add_connection(time.perf_counter() - start)
+
+        class TimedHTTPConnectionPool(HTTPConnectionPool):
+            ConnectionCls = TimedHTTPConnection
+
+        class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+            ConnectionCls = TimedHTTPSConnection
+
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool,
+        }
+
+class LinkWardenClient:
+    """Keep-alive LinkWarden API client shared by all the scripts.
+
+    Connections are pooled (pool_size should match the number of threads
+    using the client) and idempotent calls are retried with exponential
+    backoff on connection errors and 502/503/504 responses. Responses are
+    returned as-is, so callers keep using raise_for_status().
+    """
+
+    def __init__(self, base_url: str, api_key: Optional[str], pool_size: int = 10,
+                 retries: int = 3, backoff: float = 0.5, timeout: float = 60):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.stats = ClientStats()
+
+        # Whether the last iter_links() reached the end of the data rather than stopping on an error
+        self.scan_complete = False
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            'Authorization': f'Bearer {api_key}',
+            'Accept': 'application/json',
+            'Content-Type': 'application/json'
+        })
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=IDEMPOTENT_METHODS,
+            raise_on_status=False
+        )
+        adapter = _TimedAdapter(self.stats, pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', self.timeout)
+        start = time.perf_counter()
+        try:
+            return self.session.request(method, f'{self.base_url}{path}', **kwargs)
+        finally:
+            self.stats.add_request(time.perf_counter() - start)
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request('GET', path, **kwargs)
+
+    def put(self, path: str, **kwargs) -> requests.Response:
+        return self.request('PUT', path, **kwargs)
+
+    def _fetch_links_page(self, cursor: Optional[int], params: Dict) -> List[Dict]:
+        """Fetch one page of links starting after the given cursor."""
+        response = self.get('/links', params={**params, 'cursor': cursor})
+        response.raise_for_status()
+        return response.json().get('response', [])
+
+    def _scan_pages(self, params: Dict, pages: queue.Queue, stop: threading.Event) -> bool:
+        """Page through one link listing into `pages`; returns whether it reached the end."""
+        cursor = None
+        while not stop.is_set():
+            try:
+                links = self._fetch_links_page(cursor, params)
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Error fetching links {params or ''}: {str(e)}")
+                return False
+
+            if not links:
+                return True
+
+            # A cursor that doesn't move means the server ignored it; stop instead of looping
+            if links[-1].get('id') == cursor:
+                logger.warning(f"Cursor did not advance past {cursor} - stopping pagination")
+                return False
+
+            # Set cursor to the ID of the last link and go on to the next page
+            cursor = links[-1].get('id')
+            logger.debug(f"Retrieved {len(links)} links {params or ''} (IDs: {links[0].get('id')} to {cursor})")
+
+            # The bounded queue holds fetchers back while the consumer catches up
+            while not stop.is_set():
+                try:
+                    pages.put(links, timeout=0.5)
+                    break
+                except queue.Full:
+                    pass
+        return False
+
+    def iter_links_many(self, param_sets: Iterable[Dict], workers: int = 4) -> Iterator[Dict]:
+        """Yield the links of several listings (e.g. one per collection), fetched concurrently.
+
+        Up to `workers` listings are paged through at once, each with its own
+        cursor; pages are yielded as they arrive, a couple of pages ahead of
+        the caller. scan_complete ends up True only if every listing was read
+        to the end.
+        """
+        param_sets = list(param_sets)
+        pages: queue.Queue = queue.Queue(maxsize=max(2, workers * 2))
+        stop = threading.Event()
+        total = 0
+        page_count = 0
+        self.scan_complete = False
+
+        if not param_sets:
+            self.scan_complete = True
+            return
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as fetchers:
+            scans = [fetchers.submit(self._scan_pages, params, pages, stop) for params in param_sets]
+            try:
+                while True:
+                    try:
+                        links = pages.get(timeout=0.1)
+                    except queue.Empty:
+                        if all(scan.done() for scan in scans) and pages.empty():
+                            break
+                        continue
+                    page_count += 1
+                    yield from links
+                    total += len(links)
+            finally:
+                # Don't leave fetchers running if the caller stopped early
+                stop.set()
+
+        self.scan_complete = all(scan.result() for scan in scans)
+        if self.scan_complete:
+            logger.info("No more links returned - reached end of data")
+        logger.info(f"Total links retrieved across {page_count} pages: {total}")
+
+    def iter_links_newest(self, param_sets: Iterable[Dict], workers: int = 4) -> Iterator[Dict]:
+        """Yield the links of several listings merged into one newest-first (highest ID first) stream.
+
+        Each listing is asked for newest first (sort=0) and read one page
+        ahead of the merge, at most `workers` page requests at a time; the
+        first pages of all listings are requested up front. scan_complete
+        ends up True only if every listing was read to the end.
+        """
+        param_sets = [{**params, 'sort': 0} for params in param_sets]
+        complete: List[bool] = []
+        self.scan_complete = False
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as fetchers:
+            def listing(params: Dict, page) -> Iterator[Dict]:
+                cursor = None
+                while True:
+                    try:
+                        links = page.result()
+                    except requests.exceptions.RequestException as e:
+                        logger.error(f"Error fetching links {params}: {str(e)}")
+                        complete.append(False)
+                        return
+                    if not links:
+                        complete.append(True)
+                        return
+                    # A cursor that doesn't move means the server ignored it; stop instead of looping
+                    if links[-1].get('id') == cursor:
+                        logger.warning(f"Cursor did not advance past {cursor} - stopping pagination")
+                        complete.append(False)
+                        return
+                    cursor = links[-1].get('id')
+                    page = fetchers.submit(self._fetch_links_page, cursor, params)
+                    yield from links
+
+            first_pages = [fetchers.submit(self._fetch_links_page, None, params) for params in param_sets]
+            listings = [listing(params, page) for params, page in zip(param_sets, first_pages)]
+            total = 0
+            for link in heapq.merge(*listings, key=lambda link: -link['id']):
+                total += 1
+                yield link
+
+        self.scan_complete = len(complete) == len(param_sets) and all(complete)
+        logger.info(f"Total links retrieved newest first from {len(param_sets)} listings: {total}")
+
+    def iter_links(self, **params) -> Iterator[Dict]:
+        """Yield all links page by page using cursor-based pagination.
+
+        The next page is prefetched in the background while the caller
+        works through the current one, so processing can start after a
+        single round-trip and there is no upper bound on the number of
+        pages. Extra keyword arguments are passed as query parameters.
+        Fetch errors end the iteration early and leave scan_complete False.
+        """
+        return self.iter_links_many([params], workers=1)
+
+    def current_user_id(self) -> Optional[int]:
+        """ID of the user the API key belongs to, or None if the server won't say."""
+        for path in CURRENT_USER_ENDPOINTS:
+            try:
+                response = self.get(path)
+                if response.status_code != 200:
+                    continue
+                data = response.json()
+            except (requests.exceptions.RequestException, ValueError) as e:
+                logger.debug(f"Could not read the current user from {path}: {e}")
+                continue
+
+            user = data.get('response', data) if isinstance(data, dict) else None
+            if isinstance(user, dict) and isinstance(user.get('id'), int):
+                return user['id']
+        return None
+
+    def get_collections(self) -> List[Dict]:
+        """All collections visible to the API key, including ones shared with the user."""
+        response = self.get('/collections')
+        response.raise_for_status()
+        return response.json().get('response', [])
+
+    def log_stats(self):
+        stats = self.stats
+        logger.info(
+            f"LinkWarden client: {stats.requests} requests over {stats.connections} connections, "
+            f"{stats.connect_seconds:.2f}s connecting, {stats.transfer_seconds:.2f}s waiting/transferring"
+        )
+
+    def close(self):
+        self.session.close()
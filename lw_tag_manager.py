@@ -1,16 +1,69 @@
 import os
+import re
 import json
+import time
+import signal
+import argparse
+import threading
 import requests
-from typing import List, Dict
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, List, Dict, Deque, Iterable, Iterator, Optional, Set, Tuple
 import logging
 from dotenv import load_dotenv
 
+from content_extract import DigestBuilder
+from link_journal import RETRY_OUTCOMES, LinkJournal
+from link_record import LinkRecord
+from link_snapshot import LinkSnapshot
+from lw_client import LinkWardenClient
+from near_duplicates import SimHashIndex, simhash
+from ollama_control import CircuitOpenError
+from ollama_pool import OllamaPool
+from run_metrics import RunMetrics
+from tag_cache import TagCache
+from tag_canonical import TagCanonicalizer
+from tag_index import TagIndex
+from tag_scheduler import RunBudget, parse_priority, prioritized
+
+load_dotenv()
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=os.getenv('LOG_LEVEL', 'INFO').upper(),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
+# Bump whenever the tagging prompt changes so cached suggestions are invalidated
+PROMPT_VERSION = 3
+
+# Number of characters of link text included in the prompt
+PROMPT_TEXT_CHARS = 1000
+
+# Suggestions longer than this are sentences or reasoning, not tags
+MAX_TAGS = 5
+MAX_TAG_CHARS = 40
+MAX_TAG_WORDS = 3
+
+# JSON schema for one link's answer in structured-output mode; Ollama constrains decoding to it
+TAG_LIST_SCHEMA = {
+    "type": "array",
+    "items": {"type": "string", "minLength": 1, "maxLength": MAX_TAG_CHARS},
+    "minItems": 1,
+    "maxItems": MAX_TAGS,
+}
+
+# Output token budget per link: free text leaves room for chatter, a schema-bound list needs little
+FREE_TEXT_NUM_PREDICT = 100
+STRUCTURED_NUM_PREDICT = 64
+
+_THINK_RE = re.compile(r'<think>.*?(</think>|$)', re.DOTALL)
+
+# A bullet or number and a label ('- ', '2. ', 'Tags: ') in front of a line of tags
+_LIST_ITEM_RE = re.compile(r"^\s*(?:[-*•]\s+|\d+[.)]\s+)?(?:\**[\w' ]{1,30}:\**\s*)?")
+
+# A watch poll stops after this many consecutive links at or below the high-water mark
+WATCH_STOP_AFTER_KNOWN = 10
+
 class LinkWardenManager:
     def __init__(self):
         load_dotenv()
@@ -18,25 +71,420 @@ class LinkWardenManager:
         
         # Use environment variables with default values
         self.base_url = os.getenv('LINKWARDEN_BASE_URL', 'https://localhost:3002/api/v1')
-        self.ollama_url = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
+        # Several inference nodes can be listed in OLLAMA_BASE_URLS (comma-separated)
+        ollama_urls = os.getenv('OLLAMA_BASE_URLS') or os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
+        self.ollama_urls = [url.strip() for url in ollama_urls.split(',') if url.strip()]
+        self.ollama_url = self.ollama_urls[0]
+        self.model = os.getenv('OLLAMA_MODEL', 'qwen3:30b')
+        # Answers are constrained to a JSON schema, and reasoning models (qwen3) are asked not to think first;
+        # set OLLAMA_THINK empty for models that reject the option
+        self.structured_output = os.getenv('OLLAMA_STRUCTURED_OUTPUT', 'true').lower() in ['true', '1', 'yes']
+        think = os.getenv('OLLAMA_THINK', 'false').lower()
+        self.think = None if not think else think in ['true', '1', 'yes']
+        # Free-text answers are streamed and cut off once the tag line is complete
+        self.stream = os.getenv('OLLAMA_STREAM', 'true').lower() in ['true', '1', 'yes']
+        self.stream_stats = Counter()
+        self._stream_lock = threading.Lock()
+        # How long Ollama keeps the model loaded after a request (Ollama duration, e.g. '30m'); unset uses its default
+        self.keep_alive = os.getenv('OLLAMA_KEEP_ALIVE') or None
         
         # New environment variable to skip links with existing tags
         self.skip_tagged_links = os.getenv('SKIP_LINKS_WITH_TAGS', 'false').lower() in ['true', '1', 'yes']
+
+        # Number of Ollama inference requests kept in flight at once, per host
+        self.workers = max(1, int(os.getenv('OLLAMA_WORKERS', '4')))
+
+        # Requests go to the least loaded healthy host. Each host's in-flight count adapts between
+        # OLLAMA_MIN_WORKERS and OLLAMA_MAX_WORKERS, and repeated timeouts/5xx open its circuit
+        # until a probe succeeds. Requests slower than OLLAMA_HEDGE_AFTER seconds are hedged on another host.
+        self.ollama = OllamaPool(
+            self.ollama_urls,
+            workers=self.workers,
+            min_workers=int(os.getenv('OLLAMA_MIN_WORKERS', '1')),
+            max_workers=int(os.getenv('OLLAMA_MAX_WORKERS', str(self.workers * 2))),
+            timeout=float(os.getenv('OLLAMA_TIMEOUT', '120')),
+            failure_threshold=int(os.getenv('OLLAMA_CIRCUIT_FAILURES', '5')),
+            reset_seconds=float(os.getenv('OLLAMA_CIRCUIT_RESET_SECONDS', '30')),
+            give_up_seconds=float(os.getenv('OLLAMA_CIRCUIT_GIVE_UP_SECONDS', '900')),
+            hedge_after=float(os.getenv('OLLAMA_HEDGE_AFTER', '0'))
+        )
+
+        self.approved_tags_file = os.getenv('APPROVED_TAGS_FILE', 'tags.txt')
+
+        # Per-stage timings and Ollama token stats, written to METRICS_PATH at the end of a run
+        self.metrics = RunMetrics()
+        self.metrics_path = os.getenv('METRICS_PATH', 'run_metrics.json')
+
+        # Tagging engine: 'llm' generates free-form tags, 'embedding' matches tags.txt by similarity
+        self.engine = os.getenv('TAGGING_ENGINE', 'llm').lower()
+        self.embedding_tagger = None
+        if self.engine == 'embedding':
+            # numpy is only needed for this engine, so import it on demand
+            from tag_embeddings import EmbeddingTagger
+            self.embedding_tagger = EmbeddingTagger(
+                self.ollama,
+                os.getenv('OLLAMA_EMBED_MODEL', 'nomic-embed-text'),
+                self.load_approved_tags(self.approved_tags_file),
+                cache_path=os.getenv('TAG_EMBEDDINGS_PATH', 'tag_embeddings.npz'),
+                top_k=int(os.getenv('EMBEDDING_TOP_K', '3')),
+                min_similarity=float(os.getenv('EMBEDDING_MIN_SIMILARITY', '0.5')),
+                keep_alive=self.keep_alive,
+                metrics=self.metrics
+            )
+        elif self.engine != 'llm':
+            raise ValueError(f"Unknown TAGGING_ENGINE '{self.engine}' (expected 'llm' or 'embedding')")
+
+        # Number of links per Ollama request; embedding calls are cheap enough to batch widely
+        default_batch_size = '32' if self.embedding_tagger else '1'
+        self.batch_size = max(1, int(os.getenv('OLLAMA_BATCH_SIZE', default_batch_size)))
+
+        # Suggested spelling variants ('AI-Agents', 'ai agent') are mapped onto the tags.txt vocabulary
+        self.canonicalizer = None
+        canonicalize = os.getenv('TAG_CANONICALIZE', 'true').lower() in ['true', '1', 'yes']
+        if canonicalize and os.path.exists(self.approved_tags_file):
+            self.canonicalizer = TagCanonicalizer(
+                self.load_approved_tags(self.approved_tags_file),
+                max_distance=int(os.getenv('TAG_FUZZY_MAX_DISTANCE', '2'))
+            )
+
+        # A small model tags each link first; links whose answer doesn't map well onto tags.txt
+        # are escalated to OLLAMA_MODEL. Leave OLLAMA_CASCADE_MODEL unset to send every link to OLLAMA_MODEL
+        self.cascade_model = os.getenv('OLLAMA_CASCADE_MODEL') or None
+        self.cascade_min_tags = max(1, int(os.getenv('CASCADE_MIN_APPROVED_TAGS', '2')))
+        self.cascade_min_agreement = float(os.getenv('CASCADE_MIN_AGREEMENT', '0.6'))
+        self.cascade_vocabulary = None
+        self.cascade_stats: Dict[str, Counter] = {}
+        self._cascade_lock = threading.Lock()
+        if self.cascade_model and self.embedding_tagger is None:
+            approved_tags = self.load_approved_tags(self.approved_tags_file)
+            if approved_tags:
+                # learn=False: only tags in the file count as approved, not ones suggested during the run
+                self.cascade_vocabulary = TagCanonicalizer(
+                    approved_tags, max_distance=int(os.getenv('TAG_FUZZY_MAX_DISTANCE', '2')), learn=False
+                )
+            else:
+                logger.warning(f"No approved tags in {self.approved_tags_file} - sending every link to {self.model}")
+                self.cascade_model = None
+        self.models = [self.cascade_model, self.model] if self.cascade_model else [self.model]
+
+        # Order in which links are tagged by runs with a budget (e.g. 'untagged,newest'); 'none' keeps the listing order
+        self.priority = parse_priority(os.getenv('TAG_PRIORITY', 'untagged,newest'))
+
+        # Link text is reduced to a token-budgeted digest before prompting
+        self.digest_builder = DigestBuilder(
+            token_budget=int(os.getenv('DIGEST_TOKEN_BUDGET', '250')),
+            workers=int(os.getenv('DIGEST_WORKERS', '0')) or None,
+            metrics=self.metrics
+        )
+
+        # Tag writes are buffered so links gaining identical tags share one bulk request
+        self.bulk_update_size = max(1, int(os.getenv('BULK_UPDATE_MAX_PENDING', '50')))
+        self.bulk_updates = self.bulk_update_size > 1
+
+        # Links within this many SimHash bits of a tagged link reuse its tags; negative disables
+        self.near_duplicate_distance = int(os.getenv('NEAR_DUPLICATE_MAX_DISTANCE', '3'))
+        # Only the most recent leaders are matched against, so the index doesn't grow with the library
+        self.near_duplicate_window = int(os.getenv('NEAR_DUPLICATE_WINDOW', '20000'))
+
+        # Persistent cache of tag suggestions; set TAG_CACHE_PATH to empty to disable
+        cache_path = os.getenv('TAG_CACHE_PATH', 'tag_cache.sqlite')
+        self.tag_cache = None
+        if cache_path:
+            self.tag_cache = TagCache(cache_path, int(os.getenv('TAG_CACHE_MAX_ENTRIES', '50000')))
         
-        self.headers = {
-            'Authorization': f'Bearer {self.api_key}',
-            'Accept': 'application/json',
-            'Content-Type': 'application/json'
-        }
+        # Collections are paged through concurrently, each fetcher with its own connection
+        self.collection_workers = max(1, int(os.getenv('COLLECTION_FETCH_WORKERS', '4')))
+        self.user_id = int(os.getenv('LINKWARDEN_USER_ID', '0')) or None
+        self.client = LinkWardenClient(
+            self.base_url, self.api_key, pool_size=max(self.workers, self.collection_workers) + 1
+        )
+
+        # With LINK_SOURCE=snapshot links are read from a local copy kept current by delta syncs
+        self.snapshot = LinkSnapshot.from_env()
+
+        # Tags written here are recorded in filter_tags.py's tag index, once export_tags.py has created it
+        tag_index_path = os.getenv('TAG_INDEX_PATH', 'tag_index.sqlite')
+        self.tag_index = TagIndex(tag_index_path) if os.path.exists(tag_index_path) else None
     
+    def _cache_key(self, text: str) -> str:
+        # A cascade's answers depend on both models, so they are cached apart from the large model's own
+        return TagCache.make_key('>'.join(self.models), PROMPT_VERSION, text[:PROMPT_TEXT_CHARS])
+
     def get_ollama_tags(self, text: str) -> List[str]:
-        """Get auto-generated tag suggestions from Ollama."""
-        # Check if text is empty or too short
-        if not text or len(text.strip()) < 10:
-            logger.warning(f"Text too short for tag suggestion: '{text}'")
-            return []
+        """Get auto-generated tag suggestions, served from the cache when possible."""
+        return self.get_ollama_tags_batch({0: text})[0] or []
+
+    def suggest_tags_batch(self, texts: Dict[int, str]) -> Dict[int, Optional[List[str]]]:
+        """Get tag suggestions for several links from the configured engine; None where inference failed."""
+        with self.metrics.timer('inference'):
+            if self.embedding_tagger is not None:
+                return self.embedding_tagger.suggest_batch(texts)
+            return self.get_ollama_tags_batch(texts)
+
+    def get_ollama_tags_batch(self, texts: Dict[int, str]) -> Dict[int, Optional[List[str]]]:
+        """Get tag suggestions for several links, keyed by link ID (None where inference failed).
+
+        Cached and too-short texts are resolved locally; the rest go through
+        the model cascade (see _cascade).
+        """
+        results: Dict[int, Optional[List[str]]] = {}
+        uncached: Dict[int, str] = {}
+
+        for link_id, text in texts.items():
+            if not text or len(text.strip()) < 10:
+                logger.warning(f"Text too short for tag suggestion: '{text}'")
+                results[link_id] = []
+                continue
+            if self.tag_cache is not None:
+                cached = self.tag_cache.get(self._cache_key(text))
+                if cached is not None:
+                    results[link_id] = cached
+                    continue
+            uncached[link_id] = text
+
+        generated = self._cascade(uncached) if uncached else {}
+
+        for link_id, suggested_tags in generated.items():
+            results[link_id] = suggested_tags
+            # Failures come back empty; only remember real answers
+            if suggested_tags and self.tag_cache is not None:
+                self.tag_cache.put(self._cache_key(uncached[link_id]), suggested_tags)
+
+        return results
+
+    def _generate_with(self, model: str, texts: Dict[int, str]) -> Dict[int, Optional[List[str]]]:
+        """Tag suggestions from one model for every link in texts.
+
+        A single link gets its own prompt; several are packed into one. Links
+        whose entry is missing or can't be parsed from the batch answer are
+        retried one at a time.
+        """
+        if len(texts) == 1:
+            link_id, text = next(iter(texts.items()))
+            return {link_id: self._generate_ollama_tags(text, model)}
+
+        batch_results = self._generate_ollama_tags_batch(texts, model)
+
+        results = {}
+        for link_id, text in texts.items():
+            suggested_tags = batch_results.get(link_id)
+            if suggested_tags is None:
+                logger.debug(f"No usable batch answer for link {link_id}, retrying on its own")
+                suggested_tags = self._generate_ollama_tags(text, model)
+            results[link_id] = suggested_tags
+        return results
+
+    def _cascade(self, texts: Dict[int, str]) -> Dict[int, Optional[List[str]]]:
+        """Tag links with the cascade model first, escalating to the main model the answers it can't accept."""
+        if self.cascade_model is None:
+            return self._generate_with(self.model, texts)
+
+        results = {}
+        escalated = {}
+        for link_id, suggested_tags in self._generate_with(self.cascade_model, texts).items():
+            accepted = self._cascade_accept(suggested_tags)
+            if accepted is None:
+                logger.debug(f"Escalating link {link_id} to {self.model} - {self.cascade_model} suggested {suggested_tags}")
+                escalated[link_id] = texts[link_id]
+            else:
+                results[link_id] = accepted
+        self._count_tier(self.cascade_model, len(texts), len(results))
+
+        if escalated:
+            final = self._generate_with(self.model, escalated)
+            results.update(final)
+            self._count_tier(self.model, len(escalated), sum(1 for tags in final.values() if tags))
+        return results
+
+    def _cascade_accept(self, tags: Optional[List[str]]) -> Optional[List[str]]:
+        """The approved tags of a cascade answer, or None if it failed or too few of its tags map onto tags.txt."""
+        if tags is None:
+            return None
+        approved = []
+        for tag in tags:
+            canonical, _ = self.cascade_vocabulary.lookup(tag)
+            if canonical is not None and canonical not in approved:
+                approved.append(canonical)
+        if len(approved) < self.cascade_min_tags or len(approved) < self.cascade_min_agreement * len(tags):
+            return None
+        return approved
+
+    def _count_tier(self, model: str, links: int, accepted: int):
+        with self._cascade_lock:
+            stats = self.cascade_stats.setdefault(model, Counter())
+            stats['links'] += links
+            stats['accepted'] += accepted
+
+    def cascade_report(self) -> Dict[str, Dict]:
+        """Links each cascade tier was asked about, how many it answered acceptably, and its hit rate."""
+        with self._cascade_lock:
+            return {
+                model: {
+                    'links': stats['links'],
+                    'accepted': stats['accepted'],
+                    'hit_rate': round(stats['accepted'] / stats['links'], 4) if stats['links'] else 0.0,
+                }
+                for model, stats in self.cascade_stats.items()
+            }
+
+    def _ollama_generate(self, payload: Dict, links: int = 1,
+                         enough: Optional[Callable[[str], bool]] = None) -> Optional[Dict]:
+        """POST a generate request to Ollama and return the decoded result.
+
+        The request is routed by the host pool, which waits while every
+        host's circuit is open; links is the number of links it covers, so
+        host latency can be judged per link.
+
+        With enough, the answer is streamed and the request cancelled as soon
+        as enough(answer so far) is true. The result then holds the text
+        received up to that point (and no final statistics).
+        """
+        if self.keep_alive:
+            payload = {**payload, "keep_alive": self.keep_alive}
+        # The concurrency limit is tuned on the first model's latency; an escalation to the large one isn't overload
+        judge_latency = payload["model"] == self.models[0]
+
+        on_line = None
+        pieces: List[str] = []
+        final: Dict = {}
+        if enough is not None:
+            payload = {**payload, "stream": True}
+
+            def on_line(line: bytes) -> bool:
+                try:
+                    chunk = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Unreadable line in streamed Ollama answer: {line[:200]!r}")
+                    return True
+                pieces.append(chunk.get('response', ''))
+                if chunk.get('done'):
+                    final.update(chunk)
+                    return True
+                return enough(''.join(pieces))
 
         try:
+            with self.metrics.timer('ollama_request'):
+                response = self.ollama.post(
+                    '/api/generate', payload, links=links, on_line=on_line, judge_latency=judge_latency
+                )
+        except CircuitOpenError as e:
+            logger.error(f"Not calling Ollama: {e}")
+            return None
+        except requests.exceptions.RequestException as req_error:
+            logger.error(f"Network error getting Ollama tags: {req_error}")
+            return None
+
+        # Check response status
+        if response.status_code != 200:
+            logger.error(f"Ollama returned non-200 status code: {response.status_code}")
+            logger.error(f"Response content: {response.text}")
+            return None
+
+        if enough is not None:
+            result = {**final, 'response': ''.join(pieces)}
+            with self._stream_lock:
+                self.stream_stats['requests'] += 1
+                if not final:
+                    self.stream_stats['stopped_early'] += 1
+                    # Each streamed chunk is one generated token; cancelled requests report no eval_count
+                    self.stream_stats['stopped_early_tokens'] += len(pieces)
+            self.metrics.add_ollama_response(result)
+            return result
+
+        # Parse the response
+        try:
+            result = response.json()
+        except ValueError:
+            logger.error(f"Failed to parse JSON response: {response.text}")
+            return None
+        self.metrics.add_ollama_response(result)
+        return result
+
+    @staticmethod
+    def _split_free_text(text: str) -> Tuple[List[str], bool]:
+        """Raw tags of a (possibly partial) free-text answer, and whether the tag list has ended.
+
+        The tags are the first line holding a comma-separated list, or a run
+        of one-tag lines; bullets, numbering, a label such as 'Tags:' and any
+        preamble too long to be a tag are skipped. The list has ended once
+        the model moves on to the next line, or past a one-tag run.
+        """
+        lines = _THINK_RE.sub('', text).split('\n')
+        tags = []
+        for number, line in enumerate(lines):
+            item = _LIST_ITEM_RE.sub('', line, count=1).strip()
+            last = number == len(lines) - 1
+            if ',' in item:
+                if tags:
+                    return tags, True
+                return item.split(','), not last
+            if not item or len(item.split()) > MAX_TAG_WORDS:
+                if tags and not last:
+                    return tags, True
+                continue
+            tags.append(item)
+        return tags, False
+
+    @classmethod
+    def _free_text_answer(cls, text: str) -> List[str]:
+        """The raw tags of a complete free-text answer."""
+        return cls._split_free_text(text)[0]
+
+    @classmethod
+    def _free_text_complete(cls, text: str) -> bool:
+        """Whether a partial free-text answer already holds all the tags that will be used."""
+        if '<think>' in text and '</think>' not in text:
+            return False
+        tags, ended = cls._split_free_text(text)
+        # Until the list ends, the last tag may still be cut short
+        return ended or len(cls._clean_tags(tags[:-1])) >= MAX_TAGS
+
+    @staticmethod
+    def _clean_tags(tags: Iterable[str]) -> List[str]:
+        """Lowercase and strip tags, dropping empties, duplicates and anything too long to be a tag; max 5."""
+        cleaned = []
+        for tag in tags:
+            tag = tag.strip().strip('"\'.').lower()
+            if not tag or len(tag) > MAX_TAG_CHARS or len(tag.split()) > MAX_TAG_WORDS:
+                continue
+            if tag not in cleaned:
+                cleaned.append(tag)
+        return cleaned[:MAX_TAGS]
+
+    @classmethod
+    def _parse_tag_list(cls, entry) -> Optional[List[str]]:
+        """Strictly parse one link's structured answer: a list of strings, or None if it's anything else."""
+        if not isinstance(entry, list) or not all(isinstance(tag, str) for tag in entry):
+            return None
+        return cls._clean_tags(entry)
+
+    def _generate_payload(self, prompt: str, num_predict: int, output_format=None,
+                          model: Optional[str] = None) -> Dict:
+        """Generate request body; sampling settings belong in options, top-level ones are ignored."""
+        payload = {
+            "model": model or self.model,
+            "prompt": prompt,
+            "stream": False,
+            "options": {"temperature": 0.3, "num_predict": num_predict},
+        }
+        if output_format is not None:
+            payload["format"] = output_format
+        if self.think is not None:
+            payload["think"] = self.think
+        return payload
+
+    def _generate_ollama_tags(self, text: str, model: Optional[str] = None) -> Optional[List[str]]:
+        """Ask Ollama (model, by default OLLAMA_MODEL) for tag suggestions.
+
+        Returns None if the request failed or the answer couldn't be read,
+        so callers can tell a failure from an answer without usable tags.
+        """
+        try:
+            if self.structured_output:
+                answer_format = 'Answer with a JSON object like {"tags": ["python", "testing"]}'
+            else:
+                answer_format = 'Return tags as a comma-separated list'
+
             # Construct a more detailed prompt for auto-generation
             prompt = f"""
 You are an expert at extracting relevant tags from content.
@@ -45,134 +493,283 @@ Analyze the following text and generate appropriate tags.
 Guidelines:
 - Generate concise, relevant tags (1-2 words each)
 - Be precise and selective
-- Return tags as a comma-separated list
+- {answer_format}
 - Minimum 1 tag, Maximum 5 tags
 - Use lowercase
 - Focus on main topics, technologies, categories
 
 Text to analyze (len: {len(text)}):
-{text[:1000]}
+{text[:PROMPT_TEXT_CHARS]}
 
 Suggested Tags:"""
 
-            # Log the full prompt being sent
-            logger.debug(f"Full Ollama Prompt:\n{prompt}")
+            # Log the full prompt being sent; formatting it is wasted work unless DEBUG is on
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Full Ollama Prompt:\n{prompt}")
 
             # Prepare the request payload
-            payload = {
-                "model": "qwen3:30b",
-                "prompt": prompt,
-                "stream": False,
-                "temperature": 0.3,
-                "num_predict": 100,
-            }
-            
-            # Send request to Ollama
-            response = requests.post(
-                f'{self.ollama_url}/api/generate',
-                json=payload,
-                timeout=120  # Increased timeout for large models like gpt-oss:20b
-            )
-            
-            # Check response status
-            if response.status_code != 200:
-                logger.error(f"Ollama returned non-200 status code: {response.status_code}")
-                logger.error(f"Response content: {response.text}")
-                return []
-            
-            # Parse the response
-            try:
-                result = response.json()
-            except ValueError:
-                logger.error(f"Failed to parse JSON response: {response.text}")
-                return []
-            
+            if self.structured_output:
+                schema = {
+                    "type": "object",
+                    "properties": {"tags": TAG_LIST_SCHEMA},
+                    "required": ["tags"],
+                }
+                payload = self._generate_payload(prompt, STRUCTURED_NUM_PREDICT, schema, model)
+                # The schema already ends generation after the fifth tag; there's nothing to cut off
+                enough = None
+            else:
+                payload = self._generate_payload(prompt, FREE_TEXT_NUM_PREDICT, model=model)
+                enough = self._free_text_complete if self.stream else None
+
+            result = self._ollama_generate(payload, enough=enough)
+            if result is None:
+                return None
+
             # Extract and process response
             if 'response' in result:
-                response_text = result['response'].lower().strip()
+                response_text = result['response'].strip()
                 logger.debug(f"Raw Ollama response: {response_text}")
 
-                # Parse tags - accept all generated tags
-                suggested = [tag.strip() for tag in response_text.split(',')]
-                # Filter out empty tags and limit to 5
-                suggested_tags = [tag for tag in suggested if tag and len(tag) > 0]
+                if self.structured_output:
+                    try:
+                        answer = json.loads(response_text)
+                    except ValueError:
+                        logger.warning(f"Structured answer is not valid JSON: {response_text[:200]}")
+                        return None
+                    suggested_tags = self._parse_tag_list(answer.get('tags') if isinstance(answer, dict) else None)
+                    if suggested_tags is None:
+                        logger.warning(f"Structured answer doesn't match the schema: {response_text[:200]}")
+                        return None
+                else:
+                    suggested_tags = self._clean_tags(self._free_text_answer(response_text))
 
                 logger.debug(f"Generated tags: {suggested_tags}")
 
-                return suggested_tags[:5]
+                return suggested_tags
 
             logger.warning("No response key found in Ollama result")
-            return []
-            
-        except requests.exceptions.RequestException as req_error:
-            logger.error(f"Network error getting Ollama tags: {req_error}")
-            return []
+            return None
+
         except Exception as e:
             logger.error(f"Unexpected error getting Ollama tags: {e}", exc_info=True)
-            return []
+            return None
+
+    def _generate_ollama_tags_batch(self, texts: Dict[int, str], model: Optional[str] = None) -> Dict[int, List[str]]:
+        """Ask Ollama for tags for several links in one prompt.
+
+        Returns only the links whose answer parsed cleanly.
+        """
+        sections = "\n\n".join(
+            f"### Link ID {link_id}\n{text[:PROMPT_TEXT_CHARS]}" for link_id, text in texts.items()
+        )
+        prompt = f"""
+You are an expert at extracting relevant tags from content.
+Analyze each of the following texts and generate appropriate tags for each one.
+
+Guidelines:
+- Generate concise, relevant tags (1-2 words each)
+- Be precise and selective
+- Minimum 1 tag, Maximum 5 tags per text
+- Use lowercase
+- Focus on main topics, technologies, categories
+- Answer with a JSON object mapping each link ID to its list of tags,
+  e.g. {{"12": ["python", "testing"], "15": ["cooking"]}}
+
+{sections}
+
+JSON answer:"""
+
+        logger.debug(f"Batch Ollama prompt for links {list(texts)}")
+
+        if self.structured_output:
+            # One required tag list per link ID, so the model can't skip or invent links
+            schema = {
+                "type": "object",
+                "properties": {str(link_id): TAG_LIST_SCHEMA for link_id in texts},
+                "required": [str(link_id) for link_id in texts],
+            }
+            payload = self._generate_payload(prompt, STRUCTURED_NUM_PREDICT * len(texts), schema, model)
+        else:
+            payload = self._generate_payload(prompt, FREE_TEXT_NUM_PREDICT * len(texts), "json", model)
+
+        result = self._ollama_generate(payload, links=len(texts))
+        if result is None or 'response' not in result:
+            return {}
+
+        try:
+            answer = json.loads(result['response'])
+        except ValueError:
+            logger.warning(f"Batch answer is not valid JSON: {result['response'][:200]}")
+            return {}
+        if not isinstance(answer, dict):
+            return {}
+
+        parsed = {}
+        for link_id in texts:
+            entry = answer.get(str(link_id))
+            if isinstance(entry, str) and not self.structured_output:
+                entry = entry.split(',')
+            suggested_tags = self._parse_tag_list(entry)
+            if suggested_tags:
+                parsed[link_id] = suggested_tags
+
+        logger.debug(f"Batch answer parsed for {len(parsed)}/{len(texts)} links")
+        return parsed
+
+    def canonicalize_tags(self, tags: Iterable[str]) -> List[str]:
+        """Map suggested tags onto their existing spelling in the vocabulary; unknown tags pass through."""
+        if self.canonicalizer is None:
+            return list(tags)
+        with self.metrics.timer('canonicalize'):
+            return self.canonicalizer.canonicalize(tags)
 
     def load_approved_tags(self, tags_file: str) -> List[str]:
         try:
             with open(tags_file, 'r') as f:
                 # Log each tag being loaded
-                tags = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+                # Anything after a tab is an informational usage count written by export_tags.py
+                tags = [line.split('\t', 1)[0].strip() for line in f if line.strip() and not line.startswith('#')]
                 logger.debug(f"Loaded tags: {tags}")
                 return tags
         except FileNotFoundError:
             logger.error(f"Tags file {tags_file} not found")
             return []
 
-    def get_all_links(self) -> List[Dict]:
-        """Fetch all links using cursor-based pagination."""
+    def owned_collection_ids(self) -> Optional[List[int]]:
+        """IDs of the collections owned by the API key's user, or None if they can't be determined.
+
+        The user comes from LINKWARDEN_USER_ID or, failing that, is asked of
+        the server. Collections shared with the user by others are left out.
+        """
+        user_id = self.user_id or self.client.current_user_id()
+        if user_id is None:
+            logger.error("Could not determine the current user from the API; set LINKWARDEN_USER_ID")
+            return None
+
         try:
-            all_links = []
-            cursor = None
-            page = 1
-
-            while True:
-                # Build URL with cursor parameter
-                if cursor is None:
-                    url = f'{self.base_url}/links'
-                    logger.info(f"Fetching page {page} of links (initial request)...")
-                else:
-                    url = f'{self.base_url}/links?cursor={cursor}'
-                    logger.info(f"Fetching page {page} of links (cursor={cursor})...")
+            collections = self.client.get_collections()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error fetching collections: {str(e)}")
+            return None
 
-                response = requests.get(url, headers=self.headers)
-                response.raise_for_status()
-                data = response.json()
-                links = data.get('response', [])
+        owned = [c['id'] for c in collections if c.get('ownerId') == user_id]
+        logger.info(
+            f"User {user_id} owns {len(owned)} of {len(collections)} collections; "
+            f"skipping {len(collections) - len(owned)} shared by other users"
+        )
+        return owned
 
-                if not links:
-                    logger.info("No more links returned - reached end of data")
-                    break
+    def iter_links(self, collection_ids: Optional[List[int]] = None,
+                   newest_first: bool = False) -> Iterator[LinkRecord]:
+        """Yield links as compact records, from the local snapshot (after a delta sync) or the API.
+
+        With collection_ids, only links in those collections are yielded; the
+        API is asked for each collection separately, COLLECTION_FETCH_WORKERS
+        at a time. With newest_first the links come highest ID first (the
+        snapshot always yields them that way). Records from the snapshot load
+        their page text on first use; records from the API hold it until it
+        has been digested.
+        """
+        wanted = None
+        if self.snapshot is not None:
+            with self.metrics.timer('snapshot_sync'):
+                self.snapshot.sync(self.client)
+            links = self.snapshot.iter_links()
+            load_text = self.snapshot.get_text
+            # The snapshot mirrors the whole library, so the collection filter applies locally
+            if collection_ids is not None:
+                wanted = set(collection_ids)
+        elif collection_ids is not None and newest_first:
+            links = self.client.iter_links_newest(
+                [{'collectionId': collection_id} for collection_id in collection_ids],
+                workers=self.collection_workers
+            )
+            load_text = None
+        elif collection_ids is not None:
+            links = self.client.iter_links_many(
+                [{'collectionId': collection_id} for collection_id in collection_ids],
+                workers=self.collection_workers
+            )
+            load_text = None
+        else:
+            links = self.client.iter_links(sort=0) if newest_first else self.client.iter_links()
+            load_text = None
+
+        for link in self.metrics.timed_iter('fetch', links):
+            record = LinkRecord.from_api(link, load_text=load_text)
+            if wanted is not None and record.collection_id not in wanted:
+                continue
+            yield record
+
+    def fetch_link_text(self, link_id: int) -> str:
+        """Page text of one link, fetched from the API (for links whose text was dropped while queued)."""
+        try:
+            response = self.client.get(f'/links/{link_id}')
+            response.raise_for_status()
+            return response.json().get('response', {}).get('textContent') or ''
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.warning(f"Could not fetch text of link {link_id}: {e}")
+            return ''
 
-                logger.debug(f"Page {page}: Retrieved {len(links)} links (IDs: {links[0].get('id')} to {links[-1].get('id')})")
-                all_links.extend(links)
+    def tokens_spent(self) -> int:
+        """Ollama tokens used so far, including those of streamed answers cut short."""
+        return self.metrics.ollama_tokens() + self.stream_stats['stopped_early_tokens']
 
-                # Set cursor to the ID of the last link for the next request
-                cursor = links[-1].get('id')
-                page += 1
+    def poll_new_links(self, since_id: int) -> List[LinkRecord]:
+        """Links with an ID above since_id, read newest first from the API until known links come up.
 
-                # Safety limit to prevent infinite loops
-                if page > 100:
-                    logger.warning("Reached safety limit of 100 pages")
+        The cost is a page or two per call however large the library is.
+        Links from every collection are returned; callers filter by owner.
+        """
+        new_links = []
+        known_run = 0
+        for link in self.client.iter_links(sort=0):
+            if link['id'] <= since_id:
+                known_run += 1
+                if known_run >= WATCH_STOP_AFTER_KNOWN:
                     break
+                continue
+            known_run = 0
+            new_links.append(LinkRecord.from_api(link))
+        return new_links
 
-            # Log details about all the links
-            logger.info(f"Total links retrieved across {page-1} pages: {len(all_links)}")
-            for link in all_links:
-                logger.debug(f"Link details - Name: {link.get('name')}, URL: {link.get('url')}")
+    def keep_warm(self):
+        """Load the tagging model(s) on the Ollama hosts (or keep them loaded) so new links don't wait for them."""
+        if self.embedding_tagger is not None:
+            requests_to_send = [('/api/embed', {"model": self.embedding_tagger.model, "input": []})]
+        else:
+            requests_to_send = [('/api/generate', {"model": model}) for model in self.models]
+        for path, payload in requests_to_send:
+            if self.keep_alive:
+                payload["keep_alive"] = self.keep_alive
+            self.ollama.keep_warm(path, payload)
 
-            return all_links
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error fetching links: {str(e)}")
-            return []
+    def get_all_links(self) -> List[LinkRecord]:
+        """Fetch all links into a list. Prefer iter_links() for large libraries."""
+        return list(self.iter_links())
 
-    def update_link_tags(self, link_id: int, link_data: Dict, new_tags: List[str], merge: bool = True) -> bool:
+    def _link_payload(self, link: LinkRecord, tags: List[str]) -> Dict:
+        """Build the link body LinkWarden expects on updates."""
+        owner_id = link.owner_id if link.owner_id is not None else 1
+        return {
+            "id": link.id,
+            "name": link.name,
+            "url": link.url,
+            "description": link.description,
+            "tags": [{"name": tag} for tag in tags],
+            "collection": {"id": link.collection_id, "ownerId": owner_id},
+            "ownerId": owner_id
+        }
+
+    def update_link_tags(self, link_id: int, link_data: LinkRecord, new_tags: List[str], merge: bool = True) -> bool:
+        """Write tags to a link, skipping the request if nothing would change.
+
+        On success link_data.updated_at is refreshed from the server's
+        response, so callers can journal the link's post-update state.
+        """
         try:
             # Get existing tags
-            existing_tags = [tag.get('name', '') for tag in link_data.get('tags', [])]
+            existing_tags = list(link_data.tags)
 
             # Merge or replace tags based on merge parameter
             if merge:
@@ -183,81 +780,570 @@ Suggested Tags:"""
                 all_tags = new_tags
                 logger.debug(f"Replacing tags - Old: {existing_tags}, New: {all_tags}")
 
-            update_data = {
-                "id": link_id,
-                "name": link_data.get('name', ''),
-                "url": link_data.get('url', ''),
-                "description": link_data.get('description', ''),
-                "tags": [{"name": tag} for tag in all_tags],
-                "collection": link_data.get('collection', {"id": link_data.get('collectionId', 0)}),
-                "ownerId": link_data.get('collection', {}).get('ownerId', 1)
-            }
+            if all_tags == existing_tags:
+                logger.debug(f"Tags for link {link_id} already up to date, skipping update")
+                return True
 
-            # Log the update details
             logger.debug(f"Updating link {link_id} with tags: {all_tags}")
-            logger.debug(f"Full update payload: {json.dumps(update_data, indent=2)}")
 
-            response = requests.put(
-                f'{self.base_url}/links/{link_id}',
-                headers=self.headers,
-                json=update_data
-            )
+            with self.metrics.timer('update'):
+                response = self.client.put(f'/links/{link_id}', json=self._link_payload(link_data, all_tags))
             response.raise_for_status()
             logger.info(f"Successfully updated tags for link {link_id}")
+
+            try:
+                updated_at = response.json().get('response', {}).get('updatedAt')
+            except ValueError:
+                updated_at = None
+            if updated_at:
+                link_data.updated_at = updated_at
+            link_data.tags = tuple(all_tags)
+            if self.snapshot is not None:
+                self.snapshot.update_tags(link_id, all_tags, updated_at)
+            self._index_tags(link_data, updated=bool(updated_at))
             return True
         except requests.exceptions.RequestException as e:
             logger.error(f"Error updating link {link_id}: {e}")
             return False
 
+    def bulk_add_tags(self, links: List[LinkRecord], tags: List[str]) -> bool:
+        """Add the same tags to several links with one bulk update request.
+
+        Returns False if the request failed; if the server doesn't offer the
+        bulk endpoint, bulk updates are switched off for this manager. As
+        with update_link_tags, each link's updated_at is refreshed on success.
+        """
+        update_data = {
+            "links": [self._link_payload(link, list(link.tags)) for link in links],
+            "newData": {"tags": [{"name": tag} for tag in tags]},
+            "removePreviousTags": False
+        }
+        link_ids = [link.id for link in links]
+
+        try:
+            with self.metrics.timer('bulk_update'):
+                response = self.client.put('/links', json=update_data)
+            if response.status_code in (404, 405):
+                logger.warning("LinkWarden has no bulk link update endpoint - falling back to per-link updates")
+                self.bulk_updates = False
+                return False
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error bulk updating links {link_ids}: {e}")
+            return False
+
+        logger.info(f"Successfully added tags {tags} to {len(links)} links in one request")
+        updated_at = self._bulk_updated_at(response, link_ids)
+        for link in links:
+            link.tags = link.tags + tuple(tag for tag in tags if tag not in link.tags)
+            if link.id in updated_at:
+                link.updated_at = updated_at[link.id]
+            if self.snapshot is not None:
+                self.snapshot.update_tags(link.id, list(link.tags), updated_at.get(link.id))
+            self._index_tags(link, updated=link.id in updated_at)
+        return True
+
+    def _bulk_updated_at(self, response: requests.Response, link_ids: List[int]) -> Dict[int, str]:
+        """New updatedAt of bulk-updated links: from the response when it lists them, else read back one by one."""
+        try:
+            updated = response.json().get('response')
+        except ValueError:
+            updated = None
+        updated_at = {}
+        if isinstance(updated, list):
+            updated_at = {
+                entry['id']: entry['updatedAt'] for entry in updated
+                if isinstance(entry, dict) and entry.get('id') in link_ids and entry.get('updatedAt')
+            }
+
+        # Without it the journal would hold the pre-write updatedAt, and --resume would redo these links
+        for link_id in link_ids:
+            if link_id in updated_at:
+                continue
+            try:
+                response = self.client.get(f'/links/{link_id}')
+                response.raise_for_status()
+                value = response.json().get('response', {}).get('updatedAt')
+            except (requests.exceptions.RequestException, ValueError) as e:
+                logger.warning(f"Could not read back link {link_id} after the bulk update: {e}")
+                continue
+            if value:
+                updated_at[link_id] = value
+        return updated_at
+
+    def _index_tags(self, link: LinkRecord, updated: bool):
+        """Record a link's new tags in the tag index; without its new updatedAt the next sync re-reads it."""
+        if self.tag_index is None:
+            return
+        self.tag_index.update_link({
+            'id': link.id,
+            'updatedAt': link.updated_at if updated else None,
+            'tags': [{"name": tag} for tag in link.tags],
+        })
+
+class TagUpdateBatcher:
+    """Buffer tag additions and write identical ones with a single bulk request.
+
+    Links gaining the same set of tags are grouped; groups of one, or any
+    group whose bulk request fails, are written with per-link PUTs.
+    """
+
+    def __init__(self, manager: LinkWardenManager, max_pending: int = 50):
+        self.manager = manager
+        self.max_pending = max_pending
+        self._pending: List[Tuple[LinkRecord, List[str]]] = []
+
+    def add(self, link: LinkRecord, added_tags: List[str]) -> List[Tuple[LinkRecord, str]]:
+        """Queue a link's new tags; returns (link, outcome) pairs for any writes made."""
+        self._pending.append((link, added_tags))
+        if len(self._pending) >= self.max_pending:
+            return self.flush()
+        return []
+
+    def flush(self) -> List[Tuple[LinkRecord, str]]:
+        groups: Dict[Tuple[str, ...], List[LinkRecord]] = {}
+        for link, added_tags in self._pending:
+            groups.setdefault(tuple(added_tags), []).append(link)
+        self._pending = []
+
+        results = []
+        for added_tags, group in groups.items():
+            if len(group) > 1 and self.manager.bulk_updates and self.manager.bulk_add_tags(group, list(added_tags)):
+                for link in group:
+                    logger.info(f"Updated tags for '{link.name}': {list(added_tags)}")
+                    results.append((link, 'updated'))
+                continue
+
+            for link in group:
+                if self.manager.update_link_tags(link_id=link.id, link_data=link, new_tags=list(added_tags)):
+                    logger.info(f"Updated tags for '{link.name}': {list(added_tags)}")
+                    results.append((link, 'updated'))
+                else:
+                    logger.error(f"Failed to update tags for '{link.name}'")
+                    results.append((link, 'failed'))
+        return results
+
+def tag_links(manager: LinkWardenManager, links: Iterable[LinkRecord],
+              journal: Optional[LinkJournal] = None, resume: bool = False,
+              priority: Optional[List[str]] = None, budget: Optional[RunBudget] = None,
+              stream_order: Optional[str] = None) -> Counter:
+    """Tag links with up to manager.ollama.limit Ollama requests in flight.
+
+    Links are grouped into batches of manager.batch_size per request.
+    Inference runs on a thread pool; tag updates are applied on the calling
+    thread as soon as each suggestion comes back. Every processed link is
+    recorded in the journal, and with resume=True links the journal shows
+    as already tagged and unchanged since are skipped.
+
+    Only links whose tags would actually change are written, and links
+    gaining identical tags are grouped into bulk update requests.
+
+    Links whose text is a near-duplicate of an earlier link reuse that
+    link's suggestions instead of being sent for inference; if the earlier
+    link is still in flight they wait for it.
+
+    Memory stays bounded by the number of links in flight: page text is
+    dropped as soon as a link's digest is built, and near-duplicates are
+    only matched against the last manager.near_duplicate_window leaders,
+    whose IDs, signatures and (shared) tag tuples are all that is kept.
+
+    With priority keys (see tag_scheduler), eligible links are tagged most
+    important first; stream_order names the key links already arrive sorted
+    by. Once the budget is exhausted no further links are sent for
+    inference; links in flight still finish.
+    """
+    outcomes = Counter()
+    in_flight = {}
+
+    index = None
+    if manager.near_duplicate_distance >= 0:
+        index = SimHashIndex(manager.near_duplicate_distance, manager.near_duplicate_window)
+    leader_tags: Dict[int, Tuple[str, ...]] = {}
+    # Leaders with the same suggestions share one tuple
+    interned_tags: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+    followers: Dict[int, List[Tuple[LinkRecord, str]]] = {}
+    requeued: Deque[Tuple[LinkRecord, str]] = deque()
+
+    batcher = TagUpdateBatcher(manager, manager.bulk_update_size)
+
+    def record(link: LinkRecord, outcome: str):
+        outcomes[outcome] += 1
+        if journal is not None:
+            journal.record(link.id, link.updated_at, outcome)
+
+    def finish(link: LinkRecord, suggested_tags: Iterable[str]):
+        """Queue the link's effective tag changes, or record why there are none."""
+        name = link.name
+        if not suggested_tags:
+            logger.warning(f"No tags suggested for '{name}'")
+            record(link, 'no_tags')
+            return
+
+        added_tags = [tag for tag in suggested_tags if tag not in link.tags]
+        if not added_tags:
+            logger.info(f"Tags for '{name}' already up to date: {list(suggested_tags)}")
+            record(link, 'no_change')
+            return
+
+        for written, outcome in batcher.add(link, added_tags):
+            record(written, outcome)
+
+    def eligible(links: Iterable[LinkRecord]) -> Iterator[LinkRecord]:
+        for link in links:
+            # Check if we should skip links with existing tags
+            if manager.skip_tagged_links and link.tags:
+                logger.info(f"Skipping '{link.name}' - already has {len(link.tags)} tags")
+                outcomes['skipped'] += 1
+                continue
+
+            # Check if the link was already tagged and hasn't changed since
+            if resume and journal is not None and journal.is_current(link.id, link.updated_at):
+                logger.debug(f"Skipping '{link.name}' - unchanged since last run")
+                outcomes['unchanged'] += 1
+                continue
+
+            yield link
+
+    # Skipped links are filtered out before ordering and the (CPU-heavy) digest stage
+    pending = manager.digest_builder.digest_stream(
+        prioritized(eligible(links), priority or [], manager.fetch_link_text, stream_order)
+    )
+
+    def next_candidate() -> Optional[Tuple[LinkRecord, str]]:
+        """Return the next link that needs inference, with its text."""
+        # Followers of a leader that got no tags go to inference themselves
+        if requeued:
+            return requeued.popleft()
+
+        for link, text in pending:
+            logger.debug(f"Analyzing link: {link.name}")
+            logger.debug(f"Digest length for tag suggestion: {len(text)}")
+
+            signature = simhash(text) if index is not None else None
+            if signature is not None:
+                leader = index.find(signature)
+                if leader in leader_tags:
+                    logger.info(f"'{link.name}' is a near-duplicate of link {leader}, reusing its tags")
+                    outcomes['inference_avoided'] += 1
+                    finish(link, leader_tags[leader])
+                    continue
+                if leader in followers:
+                    followers[leader].append((link, text))
+                    continue
+
+                evicted = index.add(signature, link.id)
+                leader_tags.pop(evicted, None)
+                followers[link.id] = []
+
+            return link, text
+        return None
+
+    def submit_next(executor) -> bool:
+        if budget is not None and budget.exhausted():
+            return False
+
+        batch_size = manager.batch_size
+        if budget is not None and budget.remaining_links() is not None:
+            batch_size = min(batch_size, budget.remaining_links())
+
+        batch = []
+        while len(batch) < batch_size:
+            candidate = next_candidate()
+            if candidate is None:
+                break
+            batch.append(candidate)
+
+        if not batch:
+            return False
+        if budget is not None:
+            budget.spend_links(len(batch))
+
+        future = executor.submit(manager.suggest_tags_batch, {link.id: text for link, text in batch})
+        in_flight[future] = [link for link, _ in batch]
+        return True
+
+    with ThreadPoolExecutor(max_workers=manager.ollama.maximum) as executor:
+        while True:
+            if not manager.ollama.given_up:
+                while len(in_flight) < manager.ollama.limit and submit_next(executor):
+                    pass
+            elif not in_flight:
+                logger.error("Ollama is unavailable - stopping; untagged links will be picked up by the next run")
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch = in_flight.pop(future)
+                suggestions = future.result()
+                for link in batch:
+                    suggested_tags = suggestions.get(link.id)
+                    if suggested_tags is None:
+                        # Unlike an answer without tags, a failed request is worth retrying
+                        logger.warning(f"Getting tags for '{link.name}' failed")
+                        record(link, 'inference_failed')
+                        requeued.extend(followers.pop(link.id, []))
+                        continue
+                    suggested_tags = manager.canonicalize_tags(suggested_tags)
+                    finish(link, suggested_tags)
+
+                    waiting = followers.pop(link.id, [])
+                    if suggested_tags:
+                        if index is not None and link.id in index:
+                            if index.capacity and len(interned_tags) >= 2 * index.capacity:
+                                # Forget tuples no leader uses any more; the ones in use stay shared
+                                interned_tags.clear()
+                                interned_tags.update((tags, tags) for tags in leader_tags.values())
+                            key = tuple(suggested_tags)
+                            leader_tags[link.id] = interned_tags.setdefault(key, key)
+                        for follower, _ in waiting:
+                            logger.info(f"'{follower.name}' is a near-duplicate of link {link.id}, reusing its tags")
+                            outcomes['inference_avoided'] += 1
+                            finish(follower, suggested_tags)
+                    else:
+                        requeued.extend(waiting)
+
+    for written, outcome in batcher.flush():
+        record(written, outcome)
+
+    return outcomes
+
+def watch(manager: LinkWardenManager, journal: LinkJournal, collection_ids: List[int],
+          interval: float, keep_warm_seconds: float, max_attempts: int,
+          stop: threading.Event) -> Tuple[Counter, int]:
+    """Tag newly saved links as they appear, until stop is set; returns outcomes and links processed.
+
+    The journal's highest link ID is the high-water mark: every interval
+    seconds the newest links are read down to it, and only those above it
+    are tagged, so each poll costs a page or two whatever the library size.
+    With an empty journal the existing library is tagged first. Links that
+    failed keep the mark below them so the next poll retries them, up to
+    max_attempts times in a row; links that got no tags aren't sent to the
+    model again this session. Between polls the model is reloaded every
+    keep_warm_seconds, so a new link doesn't wait for Ollama to load it.
+    """
+    outcomes = Counter()
+    processed = 0
+    mark = journal.high_water_mark()
+    collection_ids = set(collection_ids)
+    next_warm = 0.0
+    # Links above the mark that later polls leave alone: no tags, or out of attempts
+    settled: Set[int] = set()
+
+    def counted(links: Iterable[LinkRecord]) -> Iterator[LinkRecord]:
+        nonlocal processed
+        for link in links:
+            # Stopping mid-cycle still lets in-flight links finish and buffered updates flush
+            if stop.is_set():
+                return
+            processed += 1
+            yield link
+
+    logger.info(f"Watching for new links every {interval:.0f}s (Ctrl+C to stop)")
+    while not stop.is_set():
+        # A long outage made the previous cycle give up; try Ollama again this cycle
+        manager.ollama.rearm()
+        started = time.monotonic()
+        processed_before = processed
+
+        if mark is None:
+            logger.info("Empty journal - tagging the existing library before watching for new links")
+            links = counted(manager.iter_links(sorted(collection_ids)))
+            outcomes.update(tag_links(manager, links, journal=journal, resume=True))
+            if not stop.is_set() and not manager.ollama.given_up and manager.client.scan_complete:
+                mark = journal.high_water_mark() or 0
+        else:
+            polled = manager.poll_new_links(mark)
+            if any(link.collection_id not in collection_ids for link in polled):
+                # New links in a collection we don't know of yet; it may be a new collection of ours
+                collection_ids = set(manager.owned_collection_ids() or collection_ids)
+            new_links = [link for link in polled if link.collection_id in collection_ids and link.id not in settled]
+
+            if new_links:
+                logger.info(f"Found {len(new_links)} new links above link {mark}")
+                outcomes.update(tag_links(manager, counted(new_links), journal=journal, resume=True))
+                logger.info(f"Tagged {len(new_links)} new links in {time.monotonic() - started:.1f}s")
+                next_warm = time.monotonic() + keep_warm_seconds
+
+            if polled and not stop.is_set() and not manager.ollama.given_up:
+                failed = []
+                for link in new_links:
+                    outcome = journal.outcome(link.id)
+                    if outcome in RETRY_OUTCOMES and journal.failed_attempts(link.id) < max_attempts:
+                        failed.append(link.id)
+                    elif outcome in RETRY_OUTCOMES:
+                        logger.warning(f"Giving up on link {link.id} after {max_attempts} failed attempts; "
+                                       f"a --resume run will retry it")
+                        settled.add(link.id)
+                    elif outcome == 'no_tags':
+                        settled.add(link.id)
+                mark = min(failed) - 1 if failed else max(link.id for link in polled)
+                settled = {link_id for link_id in settled if link_id > mark}
+
+        if processed > processed_before:
+            write_run_metrics(manager, outcomes, processed, log=False)
+
+        if keep_warm_seconds > 0 and time.monotonic() >= next_warm:
+            manager.keep_warm()
+            next_warm = time.monotonic() + keep_warm_seconds
+
+        stop.wait(max(0.0, interval - (time.monotonic() - started)))
+
+    return outcomes, processed
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Auto-generate LinkWarden tags with Ollama")
+    parser.add_argument(
+        '--resume', '--incremental', dest='resume', action='store_true',
+        default=os.getenv('RESUME_FROM_JOURNAL', 'false').lower() in ['true', '1', 'yes'],
+        help="skip links already tagged and unchanged since the last run"
+    )
+    parser.add_argument(
+        '--max-minutes', type=float, default=float(os.getenv('TAG_TIME_BUDGET_MINUTES', '0')),
+        help="stop starting new work after this many minutes"
+    )
+    parser.add_argument(
+        '--max-links', type=int, default=int(os.getenv('TAG_LINK_BUDGET', '0')),
+        help="send at most this many links to the model"
+    )
+    parser.add_argument(
+        '--max-tokens', type=int, default=int(os.getenv('TAG_TOKEN_BUDGET', '0')),
+        help="stop starting new work once Ollama has processed this many tokens"
+    )
+    parser.add_argument(
+        '--watch', action='store_true',
+        help="keep running and tag newly saved links as they appear"
+    )
+    parser.add_argument(
+        '--interval', type=float, default=float(os.getenv('WATCH_INTERVAL', '60')),
+        help="seconds between polls in --watch mode"
+    )
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
     manager = LinkWardenManager()
+    journal = LinkJournal(os.getenv('LINK_JOURNAL_PATH', 'link_journal.sqlite'))
 
-    logger.info("Auto-generating tags using AI (no predefined tag list)")
-
-    # Get all links
-    all_links = manager.get_all_links()
-    logger.info(f"Found {len(all_links)} total links")
-
-    # Filter to only current user's links (owner ID 1)
-    # Skip links from other users/shared collections
-    links = [link for link in all_links if link.get('collection', {}).get('ownerId') == 1]
-    logger.info(f"Filtered to {len(links)} links owned by current user (owner ID 1)")
-    logger.info(f"Skipped {len(all_links) - len(links)} links from other owners")
-
-    # Process each link
-    for link in links:
-        name = link.get('name', '')
-        description = link.get('description', '')
-        text_content = link.get('textContent', '')
-        url = link.get('url', '')
-        existing_tags = link.get('tags', [])
-
-        # Check if we should skip links with existing tags
-        if manager.skip_tagged_links and existing_tags:
-            logger.info(f"Skipping '{name}' - already has {len(existing_tags)} tags")
-            continue
-
-        # Combine text for analysis, prioritizing content
-        text_to_analyze = text_content or description or name
-
-        logger.debug(f"Analyzing link: {name}")
-        logger.debug(f"Text length for tag suggestion: {len(text_to_analyze)}")
-
-        # Get auto-generated tag suggestions from Ollama
-        suggested_tags = manager.get_ollama_tags(text_to_analyze)
-
-        if suggested_tags:
-            success = manager.update_link_tags(
-                link_id=link['id'],
-                link_data=link,
-                new_tags=suggested_tags
-            )
-            if success:
-                logger.info(f"Updated tags for '{name}': {suggested_tags}")
-            else:
-                logger.error(f"Failed to update tags for '{name}'")
-        else:
-            logger.warning(f"No tags suggested for '{name}'")
+    if manager.embedding_tagger is not None:
+        logger.info(f"Tagging by embedding similarity against {len(manager.embedding_tagger.tags)} approved tags")
+    elif manager.cascade_model is not None:
+        logger.info(
+            f"Auto-generating tags with {manager.cascade_model}, escalating to {manager.model} when fewer than "
+            f"{manager.cascade_min_tags} tags (or {manager.cascade_min_agreement:.0%}) are in {manager.approved_tags_file}"
+        )
+    else:
+        logger.info("Auto-generating tags using AI (no predefined tag list)")
+
+    # Only the current user's collections are fetched; links in collections
+    # shared by other users are left alone
+    collection_ids = manager.owned_collection_ids()
+    if collection_ids is None:
+        journal.close()
+        return
+    seen = Counter()
+    budget = RunBudget(args.max_minutes * 60, args.max_links, args.max_tokens, tokens=manager.tokens_spent)
+    # Ordering only pays off when a budget means some links are left for later. Newest first comes
+    # straight from the API; other keys hold links back until the listing is complete
+    priority = manager.priority if budget.limited and not args.watch else []
+    newest_first = 'newest' in priority
+
+    def owned_links() -> Iterator[LinkRecord]:
+        for link in manager.iter_links(collection_ids, newest_first=newest_first):
+            seen['owned'] += 1
+            yield link
+
+    # Process links with a bounded number of concurrent Ollama requests
+    logger.info(
+        f"Tagging on {len(manager.ollama.hosts)} Ollama host(s) with {manager.workers} concurrent workers each "
+        f"(adapting between {manager.ollama.minimum} and {manager.ollama.maximum} in total), "
+        f"{manager.batch_size} links per request"
+    )
+    if args.watch:
+        # Finish the current cycle on Ctrl+C / SIGTERM instead of abandoning buffered updates
+        stop = threading.Event()
+        signal.signal(signal.SIGINT, lambda *_: stop.set())
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        outcomes, seen['owned'] = watch(
+            manager, journal, collection_ids, args.interval,
+            float(os.getenv('OLLAMA_KEEP_WARM_SECONDS', '240')),
+            int(os.getenv('WATCH_MAX_ATTEMPTS', '5')), stop
+        )
+    else:
+        if args.resume:
+            logger.info(f"Resuming: skipping links tagged and unchanged since the last run ({len(journal)} journaled)")
+        outcomes = tag_links(
+            manager, owned_links(), journal=journal, resume=args.resume, priority=priority,
+            budget=budget if budget.limited else None, stream_order='newest' if newest_first else None
+        )
+    journal.close()
+    manager.digest_builder.close()
+    manager.ollama.log_stats()
+    manager.ollama.close()
+    if manager.snapshot is not None:
+        manager.snapshot.close()
+    if manager.tag_index is not None:
+        manager.tag_index.close()
+
+    logger.info(f"Processed {seen['owned']} links in {len(collection_ids)} collections owned by the current user")
+    manager.client.log_stats()
+    if manager.tag_cache is not None:
+        manager.tag_cache.log_stats()
+    if manager.canonicalizer is not None:
+        stats = manager.canonicalizer.stats()
+        logger.info(
+            f"Canonicalized suggestions against {stats['vocabulary']} tags: {stats['exact_matches']} exact, "
+            f"{stats['stem_matches']} by stem, {stats['fuzzy_matches']} fuzzy, "
+            f"{stats['distinct_new_tags']} new tags"
+        )
+
+    logger.info(
+        f"Tagging complete: {outcomes['updated']} updated, {outcomes['failed']} failed, "
+        f"{outcomes['inference_failed']} not tagged because Ollama failed, "
+        f"{outcomes['no_change']} already up to date, "
+        f"{outcomes['no_tags']} without suggestions, {outcomes['skipped']} skipped, "
+        f"{outcomes['unchanged']} unchanged since last run"
+    )
+    logger.info(f"Near-duplicate reuse avoided {outcomes['inference_avoided']} inference calls")
+    for model, stats in manager.cascade_report().items():
+        logger.info(
+            f"Model cascade: {model} answered {stats['accepted']}/{stats['links']} links "
+            f"it was asked about ({stats['hit_rate']:.0%})"
+        )
+
+    write_run_metrics(manager, outcomes, seen['owned'])
+
+def write_run_metrics(manager: LinkWardenManager, outcomes: Counter, links: int, log: bool = True):
+    """Log the per-stage report and write it to METRICS_PATH (JSON, or Prometheus textfile for .prom)."""
+    cache = {'near_duplicate_hits': outcomes['inference_avoided']}
+    if manager.tag_cache is not None:
+        cache.update(
+            tag_cache_hits=manager.tag_cache.hits,
+            tag_cache_misses=manager.tag_cache.misses,
+            tag_cache_hit_rate=round(manager.tag_cache.hit_rate(), 4)
+        )
+    extra = {
+        'outcomes': dict(outcomes),
+        'cache': cache,
+        'linkwarden': manager.client.stats.as_dict(),
+        'ollama_hosts': manager.ollama.stats(),
+    }
+    if manager.canonicalizer is not None:
+        extra['canonical_tags'] = manager.canonicalizer.stats()
+    if manager.stream_stats:
+        extra['ollama_streaming'] = dict(manager.stream_stats)
+    if manager.cascade_stats:
+        extra['model_cascade'] = manager.cascade_report()
+
+    if manager.metrics_path:
+        # Hosts and models become labels in Prometheus textfiles; URLs and tags like ':30b' aren't valid in names
+        summary = manager.metrics.write(
+            manager.metrics_path, links, extra, labels={'ollama_hosts.hosts': 'host', 'model_cascade': 'model'}
+        )
+    else:
+        summary = manager.metrics.summary(links, extra)
+    if log:
+        manager.metrics.log_summary(summary)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,109 @@
+import re
+import hashlib
+from collections import Counter, defaultdict
+from itertools import combinations
+from typing import Dict, Hashable, List, Optional
+
+SIGNATURE_BITS = 64
+
+# Only the start of long texts is fingerprinted; mirrors agree well before this
+SIMHASH_TEXT_CHARS = 8000
+
+# Texts with fewer tokens than this are too short to fingerprint reliably
+MIN_TOKENS = 20
+
+_TOKEN_RE = re.compile(r'\w+')
+
+def simhash(text: str) -> Optional[int]:
+    """64-bit SimHash of a text's word unigrams and bigrams.
+
+    Near-identical texts (mirrors, AMP pages, re-shares) get signatures a
+    few bits apart. Returns None for texts too short to fingerprint.
+    """
+    words = _TOKEN_RE.findall(text[:SIMHASH_TEXT_CHARS].lower())
+    if len(words) < MIN_TOKENS:
+        return None
+
+    features = Counter(words)
+    features.update(f'{a} {b}' for a, b in zip(words, words[1:]))
+
+    weights = [0] * SIGNATURE_BITS
+    for feature, count in features.items():
+        value = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(SIGNATURE_BITS):
+            if value >> bit & 1:
+                weights[bit] += count
+            else:
+                weights[bit] -= count
+
+    signature = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            signature |= 1 << bit
+    return signature
+
+class SimHashIndex:
+    """Find stored signatures within max_distance bits of a query.
+
+    Signatures are cut into blocks; a match differs in at most max_distance
+    of them, so the remaining blocks are identical. Each table keys every
+    signature on one such choice of blocks, and there are enough blocks that
+    the key spans at least MIN_KEY_BITS bits: a lookup only meets signatures
+    agreeing on that many bits, not a bucket that fills up as the index grows.
+    max_distance 3 needs four tables of 16-bit keys; every extra bit of
+    distance adds tables (and memory per signature), e.g. 28 tables for 6.
+
+    With a capacity, only the most recently added signatures are kept.
+    """
+
+    MIN_KEY_BITS = 16
+
+    def __init__(self, max_distance: int = 3, capacity: int = 0):
+        self.max_distance = max_distance
+        self.capacity = capacity
+        # Insertion-ordered, so the first key is the oldest
+        self._signatures: Dict[Hashable, int] = {}
+        blocks = max_distance + 1
+        while SIGNATURE_BITS * (blocks - max_distance) // blocks < self.MIN_KEY_BITS:
+            blocks += 1
+        edges = [SIGNATURE_BITS * block // blocks for block in range(blocks + 1)]
+        block_masks = [(1 << high) - (1 << low) for low, high in zip(edges, edges[1:])]
+        self._masks = [sum(chosen) for chosen in combinations(block_masks, blocks - max_distance)]
+        self._tables: List[Dict[int, List]] = [defaultdict(list) for _ in self._masks]
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._signatures
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def add(self, signature: int, key: Hashable) -> Optional[Hashable]:
+        """Store a signature; returns the key evicted to stay within capacity, if any."""
+        self._signatures[key] = signature
+        entry = (signature, key)
+        for mask, table in zip(self._masks, self._tables):
+            table[signature & mask].append(entry)
+        if not self.capacity or len(self._signatures) <= self.capacity:
+            return None
+        oldest = next(iter(self._signatures))
+        self._remove(oldest)
+        return oldest
+
+    def _remove(self, key: Hashable):
+        signature = self._signatures.pop(key)
+        for mask, table in zip(self._masks, self._tables):
+            bucket = table[signature & mask]
+            bucket.remove((signature, key))
+            if not bucket:
+                del table[signature & mask]
+
+    def find(self, signature: int) -> Optional[Hashable]:
+        """Return the key of the closest stored signature within range, if any."""
+        best_key = None
+        best_distance = self.max_distance + 1
+        for mask, table in zip(self._masks, self._tables):
+            for candidate, key in table.get(signature & mask, ()):
+                distance = bin(signature ^ candidate).count('1')
+                if distance < best_distance:
+                    best_key, best_distance = key, distance
+        return best_key
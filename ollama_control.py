@@ -0,0 +1,184 @@
+import time
+import logging
+import threading
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(Exception):
+    """Raised when Ollama has been failing for too long to keep waiting for it."""
+
+class AdaptiveConcurrency:
+    """AIMD limit on concurrent Ollama requests, driven by latency and errors.
+
+    The limit grows by about one per window of successful requests while
+    (smoothed) latency stays within `tolerance` times the best seen recently,
+    i.e. while requests aren't queuing on the GPU. Latency above that
+    shrinks it by `latency_backoff`, and timeouts or 5xx errors halve it.
+    Only requests started after the last decrease can trigger another one,
+    so a burst of slow responses from one overloaded moment counts once.
+    """
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: Optional[int] = None,
+                 tolerance: float = 2.0, error_backoff: float = 0.5, latency_backoff: float = 0.9,
+                 name: str = 'Ollama'):
+        self.name = name
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum or initial)
+        self.tolerance = tolerance
+        self.error_backoff = error_backoff
+        self.latency_backoff = latency_backoff
+        self._lock = threading.Lock()
+        self._limit = float(min(max(initial, self.minimum), self.maximum))
+        self._smoothed: Optional[float] = None
+        self._baseline: Optional[float] = None
+        self._last_decrease = 0.0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def _decrease(self, factor: float, started: float, reason: str):
+        if started < self._last_decrease:
+            return
+        previous = self.limit
+        self._limit = max(self.minimum, self._limit * factor)
+        self._last_decrease = time.monotonic()
+        if self.limit != previous:
+            logger.info(f"{self.name} concurrency {previous} -> {self.limit} ({reason})")
+
+    def on_success(self, started: float, latency: float):
+        """Record a successful request that started at `started` (time.monotonic())."""
+        with self._lock:
+            # Smooth out per-request jitter (answers vary in length) before judging latency
+            self._smoothed = latency if self._smoothed is None else 0.7 * self._smoothed + 0.3 * latency
+
+            # The baseline tracks the best recent smoothed latency and slowly forgets it,
+            # so a model swap to a slower model doesn't keep the limit pinned down
+            if self._baseline is None or self._smoothed < self._baseline:
+                self._baseline = self._smoothed
+            else:
+                self._baseline *= 1.01
+
+            if self._smoothed > self._baseline * self.tolerance:
+                self._decrease(self.latency_backoff, started, f"latency {self._smoothed:.1f}s")
+                return
+
+            previous = self.limit
+            self._limit = min(self.maximum, self._limit + 1.0 / self._limit)
+            if self.limit != previous:
+                logger.debug(f"{self.name} concurrency {previous} -> {self.limit}")
+
+    def on_failure(self, started: float):
+        """Record a timeout, connection error or 5xx response."""
+        with self._lock:
+            self._decrease(self.error_backoff, started, "errors")
+
+class CircuitBreaker:
+    """Stop calling Ollama after repeated failures and probe until it recovers.
+
+    After `failure_threshold` consecutive failures the circuit opens: callers
+    block in before_call() instead of piling up timeouts. Once
+    `reset_seconds` have passed a single probe request is let through; if it
+    succeeds the circuit closes, otherwise it reopens for twice as long (up
+    to `max_reset_seconds`). When the circuit has been open for longer than
+    `give_up_seconds`, before_call() raises CircuitOpenError.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30, max_reset_seconds: float = 300,
+                 give_up_seconds: float = 900, probe_timeout: float = 120, name: str = 'Ollama'):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.max_reset_seconds = max(reset_seconds, max_reset_seconds)
+        self.give_up_seconds = give_up_seconds
+        self.probe_timeout = probe_timeout
+        self.state = self.CLOSED
+        self.times_opened = 0
+        self._condition = threading.Condition()
+        self._failures = 0
+        self._current_reset = reset_seconds
+        self._retry_at = 0.0
+        self._first_opened: Optional[float] = None
+
+    @property
+    def given_up(self) -> bool:
+        with self._condition:
+            return self._gave_up(time.monotonic())
+
+    def _gave_up(self, now: float) -> bool:
+        return self._first_opened is not None and now - self._first_opened > self.give_up_seconds
+
+    def _may_call(self, now: float) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if now >= self._retry_at and not self._gave_up(now):
+            # Let one probe through; a probe that never reports back is replaced after probe_timeout
+            self.state = self.HALF_OPEN
+            self._retry_at = now + self.probe_timeout
+            logger.info(f"{self.name} circuit half-open - sending a probe request")
+            return True
+        return False
+
+    def before_call(self):
+        """Wait until a request may be sent; raises CircuitOpenError once we've given up."""
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                if self._may_call(now):
+                    return
+                if self._gave_up(now):
+                    raise CircuitOpenError(f"{self.name} has been failing for over {self.give_up_seconds:.0f}s")
+                self._condition.wait(self._retry_at - now)
+
+    def try_call(self) -> bool:
+        """Non-blocking before_call(): whether a request may be sent right now."""
+        with self._condition:
+            return self._may_call(time.monotonic())
+
+    @property
+    def retry_at(self) -> float:
+        """time.monotonic() at which the next probe may be sent (0 while closed)."""
+        with self._condition:
+            return self._retry_at if self.state != self.CLOSED else 0.0
+
+    def rearm(self):
+        """Start a new give-up period after giving up, so the next call probes again."""
+        with self._condition:
+            now = time.monotonic()
+            if self._gave_up(now):
+                self._first_opened = now
+                self._retry_at = now
+                self._condition.notify_all()
+
+    def record_success(self):
+        with self._condition:
+            if self.state != self.CLOSED:
+                logger.info(f"{self.name} recovered - circuit closed")
+            self.state = self.CLOSED
+            self._failures = 0
+            self._current_reset = self.reset_seconds
+            self._first_opened = None
+            self._condition.notify_all()
+
+    def record_failure(self):
+        with self._condition:
+            now = time.monotonic()
+            self._failures += 1
+            if self.state == self.HALF_OPEN:
+                self._current_reset = min(self._current_reset * 2, self.max_reset_seconds)
+            elif self.state == self.OPEN or self._failures < self.failure_threshold:
+                return
+
+            self.state = self.OPEN
+            self.times_opened += 1
+            self._retry_at = now + self._current_reset
+            if self._first_opened is None:
+                self._first_opened = now
+            logger.warning(
+                f"{self.name} circuit open after {self._failures} consecutive failures - "
+                f"pausing requests for {self._current_reset:.0f}s"
+            )
+            self._condition.notify_all()
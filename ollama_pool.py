@@ -0,0 +1,250 @@
+import time
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from typing import Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ollama_control import AdaptiveConcurrency, CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+class OllamaHost:
+    """One Ollama endpoint with its own health, adaptive limit and request counters."""
+
+    def __init__(self, url: str, concurrency: AdaptiveConcurrency, breaker: CircuitBreaker, pool_size: int = 10):
+        self.url = url.rstrip('/')
+        self.concurrency = concurrency
+        self.breaker = breaker
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.wins = 0
+        self._lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @property
+    def load(self) -> float:
+        """Outstanding requests relative to what the host currently accepts."""
+        return self.outstanding / max(1, self.concurrency.limit)
+
+    def post(self, path: str, payload: Dict, timeout: float, links: int = 1,
+             on_line: Optional[Callable[[bytes], bool]] = None, judge_latency: bool = True) -> requests.Response:
+        """POST to the host, feeding the outcome to its circuit breaker and concurrency limit.
+
+        With on_line, the response is streamed and each non-empty line passed
+        to it as it arrives; returning True stops reading and closes the
+        connection, which makes Ollama stop generating. With judge_latency
+        False a success doesn't adjust the concurrency limit (for requests to
+        a model slower than the one the limit is tuned on); failures still do.
+        """
+        with self._lock:
+            self.outstanding += 1
+            self.requests += 1
+        started = time.monotonic()
+        try:
+            response = self.session.post(f'{self.url}{path}', json=payload, timeout=timeout, stream=on_line is not None)
+            if on_line is not None and response.status_code == 200:
+                with response:
+                    for line in response.iter_lines():
+                        if line and on_line(line):
+                            break
+        except requests.exceptions.RequestException:
+            self._failed(started)
+            raise
+        finally:
+            with self._lock:
+                self.outstanding -= 1
+
+        if response.status_code >= 500:
+            self._failed(started)
+        else:
+            self.breaker.record_success()
+            if judge_latency:
+                self.concurrency.on_success(started, (time.monotonic() - started) / max(1, links))
+        return response
+
+    def _failed(self, started: float):
+        with self._lock:
+            self.failures += 1
+        self.breaker.record_failure()
+        self.concurrency.on_failure(started)
+
+    def stats(self) -> Dict:
+        return {
+            'requests': self.requests,
+            'failures': self.failures,
+            'hedge_wins': self.wins,
+            'concurrency': self.concurrency.limit,
+            'circuit': self.breaker.state,
+            'circuit_opened': self.breaker.times_opened,
+        }
+
+class OllamaPool:
+    """Route Ollama requests across one or more hosts.
+
+    Each request goes to the healthy host with the fewest outstanding
+    requests relative to its adaptive concurrency limit. Hosts whose circuit
+    is open are skipped until they are due a recovery probe; only when every
+    host is unavailable do callers wait. With hedge_after > 0, a request that
+    hasn't been answered within that many seconds is also sent to another
+    host with spare capacity, and whichever answers first wins.
+    """
+
+    def __init__(self, urls: List[str], workers: int = 4, min_workers: int = 1, max_workers: Optional[int] = None,
+                 timeout: float = 120, failure_threshold: int = 5, reset_seconds: float = 30,
+                 give_up_seconds: float = 900, hedge_after: float = 0):
+        if not urls:
+            raise ValueError("At least one Ollama URL is required")
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.hedges = 0
+        max_workers = max_workers or workers * 2
+
+        self.hosts = []
+        for url in urls:
+            name = f"Ollama {url}" if len(urls) > 1 else "Ollama"
+            self.hosts.append(OllamaHost(
+                url,
+                AdaptiveConcurrency(workers, minimum=min_workers, maximum=max_workers, name=name),
+                CircuitBreaker(failure_threshold, reset_seconds, give_up_seconds=give_up_seconds,
+                               probe_timeout=timeout, name=name),
+                pool_size=max_workers * 2
+            ))
+
+        self._hedger: Optional[ThreadPoolExecutor] = None
+        if hedge_after > 0 and len(self.hosts) > 1:
+            self._hedger = ThreadPoolExecutor(max_workers=self.maximum * 2, thread_name_prefix='ollama-hedge')
+
+    @property
+    def limit(self) -> int:
+        """Total requests to keep in flight: the adaptive limits of all usable hosts."""
+        usable = [host for host in self.hosts if host.breaker.state == CircuitBreaker.CLOSED]
+        return max(1, sum(host.concurrency.limit for host in usable))
+
+    @property
+    def minimum(self) -> int:
+        return sum(host.concurrency.minimum for host in self.hosts)
+
+    @property
+    def maximum(self) -> int:
+        return sum(host.concurrency.maximum for host in self.hosts)
+
+    @property
+    def given_up(self) -> bool:
+        return all(host.breaker.given_up for host in self.hosts)
+
+    def _pick(self) -> OllamaHost:
+        """Least-loaded healthy host, else one due a probe, else wait for the earliest to be."""
+        healthy = [host for host in self.hosts if host.breaker.state == CircuitBreaker.CLOSED]
+        if healthy:
+            return min(healthy, key=lambda host: (host.load, host.outstanding))
+
+        for host in sorted(self.hosts, key=lambda host: host.breaker.retry_at):
+            if host.breaker.try_call():
+                return host
+
+        # Every host is down; wait for whichever is due to be probed first
+        candidates = [host for host in self.hosts if not host.breaker.given_up] or self.hosts
+        host = min(candidates, key=lambda host: host.breaker.retry_at)
+        host.breaker.before_call()
+        return host
+
+    def _spare_host(self, exclude: OllamaHost) -> Optional[OllamaHost]:
+        spare = [
+            host for host in self.hosts
+            if host is not exclude and host.breaker.state == CircuitBreaker.CLOSED
+            and host.outstanding < host.concurrency.limit
+        ]
+        return min(spare, key=lambda host: host.load) if spare else None
+
+    def post(self, path: str, payload: Dict, links: int = 1,
+             on_line: Optional[Callable[[bytes], bool]] = None, judge_latency: bool = True) -> requests.Response:
+        """POST to the best host (hedging if enabled; streamed requests, see OllamaHost.post, are not hedged).
+
+        Raises requests' RequestException on network errors and
+        CircuitOpenError when every host has been failing for too long.
+        """
+        primary = self._pick()
+        if self._hedger is None or on_line is not None:
+            return primary.post(path, payload, self.timeout, links, on_line, judge_latency)
+
+        first = self._hedger.submit(primary.post, path, payload, self.timeout, links, None, judge_latency)
+        try:
+            return first.result(timeout=self.hedge_after)
+        except FutureTimeout:
+            pass
+
+        backup = self._spare_host(primary)
+        if backup is None:
+            return first.result()
+
+        self.hedges += 1
+        logger.debug(f"Hedging slow request to {primary.url} with {backup.url}")
+        second = self._hedger.submit(backup.post, path, payload, self.timeout, links, None, judge_latency)
+
+        pending = {first, second}
+        failed_response = None
+        error: Optional[Exception] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except requests.exceptions.RequestException as e:
+                    error = e
+                    continue
+                if response.status_code >= 500:
+                    failed_response = response
+                    continue
+                # The loser keeps running to completion; its host stays busy until then
+                if future is second:
+                    backup.wins += 1
+                return response
+
+        if failed_response is not None:
+            return failed_response
+        raise error
+
+    def rearm(self):
+        """Let hosts that were given up on be probed again (for long-running watch mode)."""
+        for host in self.hosts:
+            host.breaker.rearm()
+
+    def keep_warm(self, path: str, payload: Dict):
+        """Ask every host to load the model (or keep it loaded); failures are only logged."""
+        for host in self.hosts:
+            try:
+                host.session.post(f'{host.url}{path}', json=payload, timeout=self.timeout).raise_for_status()
+            except requests.exceptions.RequestException as e:
+                logger.debug(f"Keep-warm request to {host.url} failed: {e}")
+
+    def stats(self) -> Dict:
+        return {
+            'hedges': self.hedges,
+            'hosts': {host.url: host.stats() for host in self.hosts},
+        }
+
+    def log_stats(self):
+        if len(self.hosts) == 1 and not self.hedges:
+            return
+        for host in self.hosts:
+            stats = host.stats()
+            logger.info(
+                f"Ollama {host.url}: {stats['requests']} requests, {stats['failures']} failed, "
+                f"concurrency {stats['concurrency']}, circuit {stats['circuit']}"
+            )
+        if self._hedger is not None:
+            logger.info(f"Hedged {self.hedges} slow requests")
+
+    def close(self):
+        if self._hedger is not None:
+            self._hedger.shutdown(wait=False)
+        for host in self.hosts:
+            host.session.close()
@@ -0,0 +1,67 @@
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+class RateLimiter:
+    """Thread-safe token bucket allowing max_rps calls per second on average."""
+
+    def __init__(self, max_rps: float, burst: int = 1):
+        self.interval = 1.0 / max_rps if max_rps > 0 else 0.0
+        self.burst = max(1, burst)
+        self._lock = threading.Lock()
+        self._next_free = time.monotonic()
+
+    def acquire(self):
+        """Block until the caller may make its next call."""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            # Idle time banks at most `burst` calls
+            start = max(self._next_free, now - self.interval * (self.burst - 1))
+            self._next_free = start + self.interval
+            delay = start - now
+        if delay > 0:
+            time.sleep(delay)
+
+class RateLimitedWriter:
+    """Run write calls concurrently under an in-flight limit and a rate ceiling.
+
+    submit() blocks once max_in_flight calls are queued or running, so a
+    fast producer (such as a link stream) never builds an unbounded backlog.
+    """
+
+    def __init__(self, max_rps: float = 10, max_in_flight: int = 4):
+        self.limiter = RateLimiter(max_rps)
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight)
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        self._slots.acquire()
+
+        def run():
+            try:
+                self.limiter.acquire()
+                return fn(*args, **kwargs)
+            finally:
+                self._slots.release()
+
+        try:
+            return self._executor.submit(run)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def close(self):
+        """Wait for all submitted writes to finish."""
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
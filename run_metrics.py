@@ -0,0 +1,212 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Latency bucket upper bounds in seconds, Prometheus style
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, float('inf'))
+
+# Characters allowed in Prometheus metric names
+_METRIC_NAME_RE = re.compile(r'[^a-zA-Z0-9_:]')
+
+# Token counters and durations reported by Ollama on every generate response
+OLLAMA_COUNTERS = ('prompt_eval_count', 'prompt_eval_duration', 'eval_count', 'eval_duration', 'load_duration')
+
+def _label_value(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class Histogram:
+    """Fixed-bucket latency histogram; memory doesn't grow with the number of samples."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile (max for the last bucket)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'sum_seconds': round(self.sum, 4),
+            'mean_seconds': round(self.sum / self.count, 4) if self.count else 0.0,
+            'p50_seconds': round(self.quantile(0.5), 4),
+            'p95_seconds': round(self.quantile(0.95), 4),
+            'max_seconds': round(self.max, 4),
+        }
+
+class RunMetrics:
+    """Thread-safe per-stage timings and Ollama token stats for one run.
+
+    Stages are timed with timer() / observe() (or timed_iter() for the time
+    spent waiting on a stream). At the end of a run write() emits everything
+    as a JSON summary, or as a Prometheus textfile if the path ends in .prom.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.stages: Dict[str, Histogram] = {}
+        self.ollama: Dict[str, int] = {name: 0 for name in OLLAMA_COUNTERS}
+        self.ollama['responses'] = 0
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            self.stages.setdefault(stage, Histogram()).observe(seconds)
+
+    @contextmanager
+    def timer(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def timed_iter(self, stage: str, items: Iterable[T]) -> Iterator[T]:
+        """Pass items through, recording how long each one took to arrive."""
+        iterator = iter(items)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.observe(stage, time.perf_counter() - start)
+            yield item
+
+    def add_ollama_response(self, result: Dict):
+        """Accumulate the token counts and durations (ns) from an Ollama response."""
+        with self._lock:
+            self.ollama['responses'] += 1
+            for name in OLLAMA_COUNTERS:
+                value = result.get(name)
+                if isinstance(value, (int, float)):
+                    self.ollama[name] += int(value)
+
+    def ollama_tokens(self) -> int:
+        """Prompt plus generated tokens reported by Ollama so far."""
+        with self._lock:
+            return self.ollama['prompt_eval_count'] + self.ollama['eval_count']
+
+    @staticmethod
+    def _per_second(count: int, duration_ns: int) -> float:
+        return round(count / (duration_ns / 1e9), 2) if duration_ns else 0.0
+
+    def summary(self, links: Optional[int] = None, extra: Optional[Dict] = None) -> Dict:
+        """Everything recorded so far; links is the number of links the run handled."""
+        elapsed = time.perf_counter() - self._start
+        with self._lock:
+            ollama = dict(self.ollama)
+            summary = {
+                'started': self.started,
+                'elapsed_seconds': round(elapsed, 3),
+                'stages': {stage: histogram.as_dict() for stage, histogram in self.stages.items()},
+            }
+
+        if links is not None:
+            summary['links'] = links
+            summary['links_per_second'] = round(links / elapsed, 2) if elapsed else 0.0
+
+        ollama['prompt_tokens_per_second'] = self._per_second(ollama['prompt_eval_count'], ollama['prompt_eval_duration'])
+        ollama['generated_tokens_per_second'] = self._per_second(ollama['eval_count'], ollama['eval_duration'])
+        summary['ollama'] = ollama
+
+        if extra:
+            summary.update(extra)
+        return summary
+
+    @staticmethod
+    def _prometheus_lines(summary: Dict, prefix: str, labels: Optional[Dict[str, str]] = None) -> Iterator[str]:
+        """Textfile lines for the summary; labels maps a group's path (e.g. 'model_cascade') to a label name
+        under which that group's keys (hosts, models, ...) are written, instead of into the metric names."""
+        labels = labels or {}
+        yield f"# TYPE {prefix}_stage_seconds summary"
+        for stage, stats in summary['stages'].items():
+            yield f'{prefix}_stage_seconds{{stage="{stage}",quantile="0.5"}} {stats["p50_seconds"]}'
+            yield f'{prefix}_stage_seconds{{stage="{stage}",quantile="0.95"}} {stats["p95_seconds"]}'
+            yield f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {stats["sum_seconds"]}'
+            yield f'{prefix}_stage_seconds_count{{stage="{stage}"}} {stats["count"]}'
+
+        def numbers(path: Tuple[str, ...], values: Dict, label_values: Dict[str, str],
+                    keyed: bool = True) -> Iterator[str]:
+            label = labels.get('.'.join(path)) if keyed else None
+            for name, value in values.items():
+                if label is not None:
+                    child_path, child_labels = path, {**label_values, label: str(name)}
+                else:
+                    child_path, child_labels = path + (str(name),), label_values
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    metric = _METRIC_NAME_RE.sub('_', '_'.join((prefix,) + child_path))
+                    if child_labels:
+                        label_text = ','.join(f'{key}="{_label_value(text)}"' for key, text in child_labels.items())
+                        metric = f"{metric}{{{label_text}}}"
+                    yield f"{metric} {value}"
+                elif isinstance(value, dict):
+                    yield from numbers(child_path, value, child_labels, keyed=label is None)
+
+        yield from numbers((), {key: value for key, value in summary.items() if key != 'stages'}, {})
+
+    def write(self, path: str, links: Optional[int] = None, extra: Optional[Dict] = None, prefix: str = 'lw_tagger',
+              labels: Optional[Dict[str, str]] = None):
+        """Write the run summary to path, atomically so scrapers never see a partial file.
+
+        labels applies to Prometheus textfiles only; see _prometheus_lines.
+        """
+        summary = self.summary(links, extra)
+        if path.endswith('.prom'):
+            content = "\n".join(self._prometheus_lines(summary, prefix, labels)) + "\n"
+        else:
+            content = json.dumps(summary, indent=2)
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        logger.info(f"Run metrics written to {path}")
+        return summary
+
+    def log_summary(self, summary: Dict):
+        for stage, stats in summary['stages'].items():
+            logger.info(
+                f"Stage {stage}: {stats['count']} calls, mean {stats['mean_seconds']:.3f}s, "
+                f"p95 {stats['p95_seconds']:.3f}s, total {stats['sum_seconds']:.1f}s"
+            )
+        if 'links_per_second' in summary:
+            logger.info(f"Throughput: {summary['links']} links in {summary['elapsed_seconds']:.1f}s "
+                        f"({summary['links_per_second']} links/s)")
+        ollama = summary['ollama']
+        if ollama['responses']:
+            logger.info(
+                f"Ollama: {ollama['prompt_eval_count']} prompt tokens at {ollama['prompt_tokens_per_second']} tok/s, "
+                f"{ollama['eval_count']} generated at {ollama['generated_tokens_per_second']} tok/s"
+            )
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+class TagCache:
+    """On-disk cache of Ollama tag suggestions keyed by content hash.
+
+    Entries are keyed by a hash of (model, prompt template version, text),
+    so a change to any of them naturally misses. When the cache grows past
+    max_entries the least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str, max_entries: int = 50000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # Shared between tagging worker threads, so serialize access ourselves
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tag_cache ("
+            " key TEXT PRIMARY KEY,"
+            " tags TEXT NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tag_cache_last_used ON tag_cache (last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM tag_cache").fetchone()[0]
+        logger.info(f"Opened tag cache {path} with {self._size} entries")
+
+    @staticmethod
+    def make_key(model: str, prompt_version: int, text: str) -> str:
+        digest = hashlib.sha256()
+        for part in (model, str(prompt_version), text):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[List[str]]:
+        with self._lock:
+            row = self._conn.execute("SELECT tags FROM tag_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._conn.execute("UPDATE tag_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return json.loads(row[0])
+
+    def put(self, key: str, tags: List[str]):
+        with self._lock:
+            existed = self._conn.execute("SELECT 1 FROM tag_cache WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tag_cache (key, tags, last_used) VALUES (?, ?, ?)",
+                (key, json.dumps(tags), time.time())
+            )
+            if not existed:
+                self._size += 1
+            if self._size > self.max_entries:
+                self._evict(self._size - self.max_entries)
+            self._conn.commit()
+
+    def _evict(self, count: int):
+        self._conn.execute(
+            "DELETE FROM tag_cache WHERE key IN"
+            " (SELECT key FROM tag_cache ORDER BY last_used LIMIT ?)",
+            (count,)
+        )
+        self._size -= count
+        self.evictions += count
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def log_stats(self):
+        logger.info(
+            f"Tag cache: {self.hits} hits, {self.misses} misses "
+            f"({self.hit_rate():.0%} hit rate), {self.evictions} evicted, {self._size} entries"
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
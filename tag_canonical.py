@@ -0,0 +1,183 @@
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_SEPARATOR_RE = re.compile(r'[\s\-_/.]+')
+_STRIP_RE = re.compile(r"[^\w\s+#]")
+
+def normalize_tag(tag: str) -> str:
+    """Case-, accent-width- and separator-insensitive form: 'AI-Agents' -> 'ai agents'."""
+    tag = unicodedata.normalize('NFKC', tag).lower()
+    tag = _SEPARATOR_RE.sub(' ', tag)
+    return _STRIP_RE.sub('', tag).strip()
+
+def _stem_word(word: str) -> str:
+    """Fold English plurals and possessives; deliberately light so distinct words stay distinct."""
+    if len(word) <= 3:
+        return word
+    if word.endswith("'s"):
+        return word[:-2]
+    if word.endswith('ies') and len(word) > 4:
+        return word[:-3] + 'y'
+    if word.endswith(('sses', 'shes', 'ches', 'xes')):
+        return word[:-2]
+    if word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+def stem_key(normalized: str) -> str:
+    """Key under which spelling variants of one tag collide: stemmed words, no separators."""
+    return ''.join(_stem_word(word) for word in normalized.split())
+
+def edit_distance(a: str, b: str, limit: Optional[int] = None) -> int:
+    """Levenshtein distance, giving up (returning limit + 1) once it must exceed limit."""
+    if limit is not None and abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+def _trigrams(key: str) -> Counter:
+    padded = f'  {key} '
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+class TrigramIndex:
+    """Find the stored key nearest to a query within a small edit distance.
+
+    Keys are padded so a key of length n has n + 1 trigrams, and one edit
+    changes at most three of them. A key within d edits of the query must
+    therefore share at least max(n, m) + 1 - 3d trigrams with it; only the
+    few keys passing that count (and the length difference) filter are
+    compared with a real edit distance. When both keys are short enough for
+    that bound to reach zero, keys sharing no trigram at all are compared too.
+    """
+
+    def __init__(self):
+        self._keys: List[str] = []
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._by_length: Dict[int, List[int]] = {}
+
+    def add(self, key: str):
+        position = len(self._keys)
+        self._keys.append(key)
+        self._by_length.setdefault(len(key), []).append(position)
+        for gram, count in _trigrams(key).items():
+            self._postings.setdefault(gram, []).append((position, count))
+
+    def nearest(self, key: str, max_distance: int) -> Optional[str]:
+        """Closest stored key within max_distance, or None."""
+        if max_distance < 0:
+            return None
+        shared: Counter = Counter()
+        for gram, count in _trigrams(key).items():
+            for position, stored in self._postings.get(gram, ()):
+                shared[position] += min(count, stored)
+        # Short keys can be within max_distance of the query without sharing a trigram
+        if len(key) + 1 <= 3 * max_distance:
+            for length in range(max(0, len(key) - max_distance), 3 * max_distance):
+                for position in self._by_length.get(length, ()):
+                    shared.setdefault(position, 0)
+
+        best, best_distance = None, max_distance + 1
+        for position, overlap in shared.items():
+            candidate = self._keys[position]
+            if abs(len(candidate) - len(key)) > max_distance:
+                continue
+            if overlap < max(len(candidate), len(key)) + 1 - 3 * max_distance:
+                continue
+            # Look for keys at least as close as the best so far; anything further comes back as limit + 1
+            distance = edit_distance(key, candidate, min(best_distance, max_distance))
+            if distance > max_distance:
+                continue
+            if best is None or distance < best_distance or (distance == best_distance and candidate < best):
+                best, best_distance = candidate, distance
+        return best
+
+class TagCanonicalizer:
+    """Map suggested tags onto an existing vocabulary (tags.txt).
+
+    Lookups go from cheapest to loosest: the normalized form ('AI-Agent' ->
+    'ai agent'), then the stemmed key ('ai agents' -> 'aiagent'), then the
+    nearest stemmed key in a trigram index within a length-scaled edit distance
+    (at most max_distance; short tags must match exactly). A suggestion
+    that matches nothing is new; with learn=True it joins the index, so its
+    own later variants collapse onto the first spelling seen.
+    """
+
+    def __init__(self, vocabulary: Iterable[str], max_distance: int = 2, learn: bool = True):
+        self.max_distance = max_distance
+        self.learn = learn
+        self._by_normal: Dict[str, str] = {}
+        self._by_stem: Dict[str, str] = {}
+        self._fuzzy = TrigramIndex()
+        self.matches: Counter = Counter()
+        self.new_tags: Counter = Counter()
+        for tag in vocabulary:
+            self.add(tag)
+
+    def __len__(self) -> int:
+        return len(self._by_stem)
+
+    def add(self, tag: str):
+        """Index a tag; the first spelling added for a stem is the canonical one."""
+        tag = tag.strip()
+        normalized = normalize_tag(tag)
+        if not normalized:
+            return
+        key = stem_key(normalized)
+        self._by_normal.setdefault(normalized, tag)
+        if key not in self._by_stem:
+            self._by_stem[key] = tag
+            self._fuzzy.add(key)
+
+    def _allowed_distance(self, key: str) -> int:
+        # One edit per five characters: 'pythn' -> 'python', but 'java' never becomes 'lava'
+        return min(self.max_distance, len(key) // 5)
+
+    def lookup(self, tag: str) -> Tuple[Optional[str], str]:
+        """(canonical tag or None, how it matched: 'exact', 'stem', 'fuzzy' or 'new')."""
+        normalized = normalize_tag(tag)
+        if not normalized:
+            return None, 'new'
+        if normalized in self._by_normal:
+            return self._by_normal[normalized], 'exact'
+
+        key = stem_key(normalized)
+        if key in self._by_stem:
+            return self._by_stem[key], 'stem'
+
+        nearest = self._fuzzy.nearest(key, self._allowed_distance(key))
+        if nearest is not None:
+            return self._by_stem[nearest], 'fuzzy'
+        return None, 'new'
+
+    def canonicalize(self, tags: Iterable[str]) -> List[str]:
+        """Replace known tags by their canonical spelling, keeping order and dropping duplicates."""
+        result = []
+        for tag in tags:
+            canonical, match = self.lookup(tag)
+            self.matches[match] += 1
+            if canonical is None:
+                canonical = tag.strip()
+                if not canonical:
+                    continue
+                self.new_tags[canonical] += 1
+                if self.learn:
+                    self.add(canonical)
+            if canonical not in result:
+                result.append(canonical)
+        return result
+
+    def stats(self) -> Dict:
+        return {
+            'vocabulary': len(self),
+            **{f'{match}_matches': self.matches[match] for match in ('exact', 'stem', 'fuzzy', 'new')},
+            'distinct_new_tags': len(self.new_tags),
+        }
@@ -0,0 +1,115 @@
+import os
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+import requests
+
+from ollama_control import CircuitOpenError
+from ollama_pool import OllamaPool
+from run_metrics import RunMetrics
+
+logger = logging.getLogger(__name__)
+
+# Number of characters of link text sent to the embedding model
+EMBEDDING_TEXT_CHARS = 2000
+
+class EmbeddingTagger:
+    """Tag links by cosine similarity between link and tag embeddings.
+
+    Every approved tag is embedded once through Ollama's /api/embed endpoint
+    and the vectors are cached on disk. Link texts are then embedded in
+    batches and matched against the whole vocabulary with one matrix product.
+    Requests go through the host pool, like generate requests.
+    """
+
+    def __init__(self, ollama: OllamaPool, model: str, tags: List[str], cache_path: str = 'tag_embeddings.npz',
+                 top_k: int = 3, min_similarity: float = 0.5, keep_alive: Optional[str] = None,
+                 metrics: Optional[RunMetrics] = None):
+        self.ollama = ollama
+        self.metrics = metrics or RunMetrics()
+        self.model = model
+        self.tags = tags
+        self.cache_path = cache_path
+        self.top_k = top_k
+        self.min_similarity = min_similarity
+        self.keep_alive = keep_alive
+        self.tag_vectors = self._load_tag_vectors()
+
+    def _embed(self, texts: List[str]) -> Optional[np.ndarray]:
+        """Embed texts with Ollama and return L2-normalized row vectors."""
+        payload = {"model": self.model, "input": texts}
+        if self.keep_alive:
+            payload["keep_alive"] = self.keep_alive
+        try:
+            with self.metrics.timer('ollama_request'):
+                response = self.ollama.post('/api/embed', payload, links=len(texts))
+            response.raise_for_status()
+            vectors = np.asarray(response.json()['embeddings'], dtype=np.float32)
+        except CircuitOpenError as e:
+            logger.error(f"Not calling Ollama: {e}")
+            return None
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            logger.error(f"Error getting embeddings from Ollama: {e}")
+            return None
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _load_tag_vectors(self) -> np.ndarray:
+        """Load tag embeddings from the cache file, embedding any that are missing."""
+        if not self.tags:
+            logger.warning("No approved tags to embed - embedding tagger will suggest nothing")
+            return np.zeros((0, 0), dtype=np.float32)
+
+        cached: Dict[str, np.ndarray] = {}
+        if os.path.exists(self.cache_path):
+            with np.load(self.cache_path, allow_pickle=False) as data:
+                if str(data['model']) == self.model:
+                    cached = dict(zip(data['tags'].tolist(), data['vectors']))
+
+        missing = [tag for tag in self.tags if tag not in cached]
+        if missing:
+            logger.info(f"Embedding {len(missing)} approved tags with {self.model}")
+            vectors = self._embed(missing)
+            if vectors is None:
+                raise RuntimeError("Could not embed the approved tag vocabulary")
+            cached.update(zip(missing, vectors))
+
+            np.savez(
+                self.cache_path,
+                model=np.array(self.model),
+                tags=np.array(list(cached)),
+                vectors=np.stack(list(cached.values()))
+            )
+        else:
+            logger.info(f"Loaded {len(self.tags)} tag embeddings from {self.cache_path}")
+
+        return np.stack([cached[tag] for tag in self.tags])
+
+    def suggest_batch(self, texts: Dict[int, str]) -> Dict[int, Optional[List[str]]]:
+        """Suggest approved tags for several links, keyed by link ID (None if embedding them failed)."""
+        link_ids = [link_id for link_id, text in texts.items() if text and text.strip()]
+        results: Dict[int, Optional[List[str]]] = {link_id: [] for link_id in texts}
+        if not link_ids or not self.tags:
+            return results
+
+        vectors = self._embed([texts[link_id][:EMBEDDING_TEXT_CHARS] for link_id in link_ids])
+        if vectors is None:
+            results.update((link_id, None) for link_id in link_ids)
+            return results
+
+        # Rows are links, columns are tags; vectors are normalized so this is cosine similarity
+        similarities = vectors @ self.tag_vectors.T
+        top_k = min(self.top_k, len(self.tags))
+        best = np.argsort(-similarities, axis=1)[:, :top_k]
+
+        for row, link_id in enumerate(link_ids):
+            results[link_id] = [
+                self.tags[column] for column in best[row]
+                if similarities[row, column] >= self.min_similarity
+            ]
+            logger.debug(f"Embedding tags for link {link_id}: {results[link_id]}")
+
+        return results
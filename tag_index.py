@@ -0,0 +1,186 @@
+import time
+import logging
+import sqlite3
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# A delta sync stops after this many consecutive links that are already indexed unchanged
+DELTA_STOP_AFTER_KNOWN = 50
+
+class TagIndex:
+    """Locally persisted inverted index of tag -> link IDs.
+
+    Each indexed link remembers its updatedAt, so syncing against a stream
+    of links only rewrites the rows of links that changed. Tag writes made
+    by these scripts are recorded directly; a delta sync picks up new links,
+    and edits made elsewhere to older links need a full sync.
+    """
+
+    def __init__(self, path: str = 'tag_index.sqlite'):
+        self.path = path
+        # Filter workers update the index from their own threads
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS indexed_links ("
+            " link_id INTEGER PRIMARY KEY,"
+            " updated_at TEXT);"
+            "CREATE TABLE IF NOT EXISTS link_tags ("
+            " tag TEXT NOT NULL,"
+            " link_id INTEGER NOT NULL,"
+            " PRIMARY KEY (tag, link_id));"
+            "CREATE INDEX IF NOT EXISTS link_tags_link ON link_tags (link_id);"
+            "CREATE TABLE IF NOT EXISTS meta ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT);"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def link_tag_names(link: Dict) -> List[str]:
+        names = []
+        for tag in link.get('tags', []):
+            name = tag.get('name', '').strip()
+            if name and name not in names:
+                names.append(name)
+        return names
+
+    def _update(self, link_id: int, updated_at: Optional[str], tags: List[str]) -> bool:
+        row = self._conn.execute("SELECT updated_at FROM indexed_links WHERE link_id = ?", (link_id,)).fetchone()
+        if row is not None and updated_at is not None and row[0] == updated_at:
+            return False
+
+        self._conn.execute("DELETE FROM link_tags WHERE link_id = ?", (link_id,))
+        self._conn.executemany("INSERT INTO link_tags (tag, link_id) VALUES (?, ?)", [(tag, link_id) for tag in tags])
+        self._conn.execute(
+            "INSERT OR REPLACE INTO indexed_links (link_id, updated_at) VALUES (?, ?)", (link_id, updated_at)
+        )
+        return True
+
+    def _remove(self, link_id: int):
+        self._conn.execute("DELETE FROM link_tags WHERE link_id = ?", (link_id,))
+        self._conn.execute("DELETE FROM indexed_links WHERE link_id = ?", (link_id,))
+
+    def remove_link(self, link_id: int):
+        """Drop a link that no longer exists."""
+        with self._lock:
+            self._remove(link_id)
+            self._conn.commit()
+
+    def update_link(self, link: Dict) -> bool:
+        """Index one link; returns False if it was already indexed at this updatedAt."""
+        with self._lock:
+            changed = self._update(link['id'], link.get('updatedAt'), self.link_tag_names(link))
+            self._conn.commit()
+            return changed
+
+    def indexing(self, links: Iterable[Dict], full: bool = True, stats: Optional[Dict] = None,
+                 is_complete: Optional[Callable[[], bool]] = None) -> Iterator[Dict]:
+        """Pass links through unchanged while indexing them.
+
+        Only links whose updatedAt changed are rewritten. With full=True the
+        stream is taken to be the whole library: once it is exhausted, links
+        missing from it are dropped from the index, unless is_complete says
+        the stream stopped short. Counts of seen, changed and removed links
+        are written to stats if given.
+        """
+        stats = stats if stats is not None else {}
+        stats.update(seen=0, changed=0, removed=0)
+        seen: Set[int] = set()
+
+        for link in links:
+            seen.add(link['id'])
+            with self._lock:
+                if self._update(link['id'], link.get('updatedAt'), self.link_tag_names(link)):
+                    stats['changed'] += 1
+                    # Commit periodically so an interrupted sync still keeps its progress
+                    if stats['changed'] % 500 == 0:
+                        self._conn.commit()
+            yield link
+
+        if full and is_complete is not None and not is_complete():
+            logger.warning("Link stream ended early - keeping index entries for links not seen")
+            full = False
+
+        with self._lock:
+            if full:
+                stale = [
+                    link_id for (link_id,) in self._conn.execute("SELECT link_id FROM indexed_links")
+                    if link_id not in seen
+                ]
+                for link_id in stale:
+                    self._remove(link_id)
+                stats['removed'] = len(stale)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('last_full_sync', ?)", (str(time.time()),)
+                )
+            self._conn.commit()
+
+        stats['seen'] = len(seen)
+        logger.info(f"Tag index synced: {stats['seen']} links seen, {stats['changed']} changed, {stats['removed']} removed")
+
+    def sync(self, links: Iterable[Dict], full: bool = True,
+             is_complete: Optional[Callable[[], bool]] = None) -> Tuple[int, int]:
+        """Bring the index up to date with a stream of links; returns (changed, removed)."""
+        stats: Dict = {}
+        for _ in self.indexing(links, full, stats, is_complete):
+            pass
+        return stats['changed'], stats['removed']
+
+    def delta_sync(self, links: Iterable[Dict], stop_after_known: int = DELTA_STOP_AFTER_KNOWN) -> int:
+        """Index a newest-first stream of links until a run of them is already indexed unchanged.
+
+        Returns the number of links (re)indexed; the caller closes the stream.
+        """
+        changed = 0
+        known_run = 0
+        for link in links:
+            with self._lock:
+                updated = self._update(link['id'], link.get('updatedAt'), self.link_tag_names(link))
+            if updated:
+                changed += 1
+                known_run = 0
+            else:
+                known_run += 1
+                if known_run >= stop_after_known:
+                    break
+        with self._lock:
+            self._conn.commit()
+        logger.info(f"Tag index delta sync: {changed} new or changed links")
+        return changed
+
+    def last_full_sync(self) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'last_full_sync'").fetchone()
+        return float(row[0]) if row else None
+
+    def tag_counts(self) -> Dict[str, int]:
+        """Number of links carrying each tag."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT tag, COUNT(*) FROM link_tags GROUP BY tag"))
+
+    def tags_for_link(self, link_id: int) -> List[str]:
+        with self._lock:
+            return [tag for (tag,) in self._conn.execute("SELECT tag FROM link_tags WHERE link_id = ?", (link_id,))]
+
+    def links_with_any_tag(self, tags: Iterable[str]) -> Set[int]:
+        """IDs of links carrying at least one of the given tags."""
+        tags = list(tags)
+        link_ids: Set[int] = set()
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(tags), 500):
+                chunk = tags[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                link_ids.update(
+                    link_id for (link_id,) in self._conn.execute(
+                        f"SELECT DISTINCT link_id FROM link_tags WHERE tag IN ({placeholders})", chunk
+                    )
+                )
+        return link_ids
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
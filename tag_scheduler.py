@@ -0,0 +1,126 @@
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional
+
+from link_record import LinkRecord
+
+logger = logging.getLogger(__name__)
+
+# Links whose page text is reloaded ahead of the one being yielded, and the threads doing it
+PRELOAD_WINDOW = 16
+PRELOAD_WORKERS = 4
+
+# Sort keys for TAG_PRIORITY; lower sorts first
+PRIORITY_KEYS = {
+    'untagged': lambda link: 0 if not link.tags else 1,
+    'fewest_tags': lambda link: len(link.tags),
+    'newest': lambda link: -link.id,
+    'oldest': lambda link: link.id,
+}
+
+# The best value a key can take; a link at the best value of every key can't be outranked
+PRIORITY_BEST = {'untagged': 0, 'fewest_tags': 0}
+
+def parse_priority(spec: str) -> List[str]:
+    """Parse a comma-separated TAG_PRIORITY; an empty list (or 'none') keeps the listing order."""
+    keys = [key.strip().lower() for key in spec.split(',') if key.strip()]
+    if keys == ['none']:
+        return []
+    unknown = [key for key in keys if key not in PRIORITY_KEYS]
+    if unknown:
+        raise ValueError(f"Unknown TAG_PRIORITY key(s) {unknown} (expected {', '.join(PRIORITY_KEYS)} or none)")
+    return keys
+
+def prioritized(links: Iterable[LinkRecord], keys: List[str], load_text: Callable[[int], str],
+                stream_order: Optional[str] = None) -> Iterator[LinkRecord]:
+    """Yield links most important first, according to the priority keys.
+
+    stream_order names the key the links already arrive sorted by (e.g.
+    'newest' for a listing with sort=0); it breaks every tie, so it and
+    any keys after it need no sorting here. Links at the best value of the
+    remaining keys are yielded as they arrive. The rest have to wait until
+    every link has been seen, so records holding their page text drop it
+    and load it again through load_text when their turn comes (a few links
+    ahead, on a small thread pool); memory stays at one compact record per
+    waiting link.
+    """
+    keys = list(keys)
+    if stream_order in keys:
+        keys = keys[:keys.index(stream_order)]
+    if not keys:
+        yield from links
+        return
+
+    def unbeatable(link: LinkRecord) -> bool:
+        return all(key in PRIORITY_BEST and PRIORITY_KEYS[key](link) == PRIORITY_BEST[key] for key in keys)
+
+    queue = []
+    for link in links:
+        if unbeatable(link):
+            yield link
+            continue
+        link.defer_text(load_text)
+        queue.append(link)
+
+    key_functions = [PRIORITY_KEYS[key] for key in keys]
+    # The sort is stable, so ties keep the stream's order
+    queue.sort(key=lambda link: tuple(function(link) for function in key_functions))
+    if queue:
+        logger.info(f"Tagging {len(queue)} remaining links in priority order ({', '.join(keys)})")
+
+    with ThreadPoolExecutor(max_workers=PRELOAD_WORKERS) as loader:
+        window = deque()
+        for link in queue:
+            # Reading .text loads and keeps it on the record
+            window.append((link, loader.submit(lambda record: record.text, link)))
+            if len(window) >= PRELOAD_WINDOW:
+                ready, loading = window.popleft()
+                loading.result()
+                yield ready
+        while window:
+            ready, loading = window.popleft()
+            loading.result()
+            yield ready
+
+class RunBudget:
+    """Limits on how much tagging work one run may do: wall-clock time, links sent to the model, tokens.
+
+    tokens is called to read the Ollama tokens (prompt + generated) spent
+    so far. Once any limit is reached no new work should be started; work
+    already in flight is allowed to finish.
+    """
+
+    def __init__(self, max_seconds: float = 0, max_links: int = 0, max_tokens: int = 0,
+                 tokens: Optional[Callable[[], int]] = None):
+        self.max_seconds = max_seconds
+        self.max_links = max_links
+        self.max_tokens = max_tokens
+        self.tokens = tokens
+        self.links = 0
+        self.exhausted_by: Optional[str] = None
+        self._start = time.monotonic()
+
+    @property
+    def limited(self) -> bool:
+        return bool(self.max_seconds or self.max_links or (self.max_tokens and self.tokens))
+
+    def remaining_links(self) -> Optional[int]:
+        return max(0, self.max_links - self.links) if self.max_links else None
+
+    def spend_links(self, count: int):
+        self.links += count
+
+    def exhausted(self) -> bool:
+        """Whether a limit has been reached; the first time, logs which one."""
+        if self.exhausted_by is None:
+            if self.max_seconds and time.monotonic() - self._start >= self.max_seconds:
+                self.exhausted_by = f"time budget of {self.max_seconds / 60:g} minutes"
+            elif self.max_links and self.links >= self.max_links:
+                self.exhausted_by = f"link budget of {self.max_links} links"
+            elif self.max_tokens and self.tokens is not None and self.tokens() >= self.max_tokens:
+                self.exhausted_by = f"token budget of {self.max_tokens} tokens"
+            if self.exhausted_by is not None:
+                logger.info(f"Reached the {self.exhausted_by} - remaining links are left for the next run")
+        return self.exhausted_by is not None
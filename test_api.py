@@ -6,7 +6,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 api_key = os.getenv('LINKWARDEN_API_KEY')
-base_url = "https://linkwarden.piipari.xyz/api/v1"
+base_url = os.getenv('LINKWARDEN_BASE_URL', 'http://localhost:3002/api/v1')
 
 headers = {
     'Authorization': f'Bearer {api_key}',
@@ -9,6 +9,10 @@ with open('.env', 'r') as f:
         elif line.startswith('LINKWARDEN_BASE_URL='):
             base_url = line.split('=', 1)[1].strip()
 
+# The environment wins over .env, e.g. to point the script at fake_servers.py
+api_key = os.getenv('LINKWARDEN_API_KEY', api_key)
+base_url = os.getenv('LINKWARDEN_BASE_URL', base_url)
+
 headers = {'Authorization': f'Bearer {api_key}'}
 
 # Test 1: Default request